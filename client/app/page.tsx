@@ -48,8 +48,13 @@ interface Stop {
 interface EldLog {
   date: string
   total_miles: number
-  img_base64: string
-  pdf_base64: string
+  off_duty_hours: number
+  sleeper_hours: number
+  driving_hours: number
+  on_duty_hours: number
+  total_hours: number
+  img_url: string
+  pdf_url: string
 }
 
 interface TripResponse {
@@ -198,8 +203,8 @@ export default function TripPlanner() {
         ...tripData,
         eld_logs: tripData.eld_logs.map((log) => ({
           ...log,
-          img_base64: "",
-          pdf_base64: "",
+          img_url: "",
+          pdf_url: "",
         })),
       }
 
@@ -549,8 +554,8 @@ export default function TripPlanner() {
                           className="h-[500px] bg-gray-50 rounded-lg overflow-hidden border border-gray-200"
                         >
                           <ELDLogViewer
-                            imgBase64Data={log.img_base64}
-                            pdfBase64Data={log.pdf_base64}
+                            imgUrl={log.img_url}
+                            pdfUrl={log.pdf_url}
                             dayNumber={index + 1}
                             date={log.date}
                           />
@@ -2,26 +2,30 @@
 import { Download, FileText } from "lucide-react"
 
 interface ELDLogViewerProps {
-  imgBase64Data: string
-  pdfBase64Data: string
+  imgUrl: string
+  pdfUrl: string
   dayNumber?: number
   date?: string
 }
 
-export default function ELDLogViewer({ imgBase64Data, pdfBase64Data, dayNumber, date }: ELDLogViewerProps) {
+export default function ELDLogViewer({ imgUrl, pdfUrl, dayNumber, date }: ELDLogViewerProps) {
   const handleDownload = () => {
-    if (!pdfBase64Data) return
+    if (!pdfUrl) return
+
+    // the download attribute is ignored for cross-origin links, so the server
+    // is asked to send the PDF as an attachment instead
+    const url = new URL(pdfUrl, window.location.href)
+    url.searchParams.set("download", "true")
 
-    const pdfUrl = `data:application/pdf;base64,${pdfBase64Data}`
     const link = document.createElement("a")
-    link.href = pdfUrl
+    link.href = url.toString()
     link.download = date ? `ELD_Log_${date}.pdf` : `ELD_Log_Day_${dayNumber || 1}.pdf`
     document.body.appendChild(link)
     link.click()
     document.body.removeChild(link)
   }
 
-  if (!pdfBase64Data) {
+  if (!pdfUrl) {
     return (
       <div className="flex flex-col items-center justify-center h-full p-4">
         <FileText size={48} className="text-indigo-400 mb-4" />
@@ -42,7 +46,7 @@ export default function ELDLogViewer({ imgBase64Data, pdfBase64Data, dayNumber,
       </div>
       <div className="relative flex-1 bg-white border border-gray-200 rounded-md overflow-hidden">
       <img
-        src={`data:image/png;base64,${imgBase64Data}`}
+        src={imgUrl}
         alt={date ? `ELD Log ${date}` : `ELD Log Day ${dayNumber || 1}`}
         className="w-full h-full"
       />
@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from api_v1.helpers.plan_cache import PlanCache
+from api_v1.helpers.trip_calculator import TripCalculator
+from api_v1.lib.logger import general_logger
+from api_v1.lib.mapbox import MapBoxAPI, MapBoxRequestCache
+from api_v1.serializers import TripSerializer
+from django.conf import settings
+from django.db import connection, transaction
+
+
+class BatchPlanner:
+    """
+    Plans many trips concurrently on a bounded thread pool.
+
+    Trips of a batch that normalize to the same plan key are planned once and
+    the others get a copy of that plan. All trips share one Mapbox request cache
+    so identical lookups (same lane, same fuel station search) are only made once.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or settings.TRIP_BATCH_MAX_WORKERS
+        self.plan_cache = PlanCache()
+        self.trip_calculator = TripCalculator(
+            mapbox_api=MapBoxAPI(request_cache=MapBoxRequestCache())
+        )
+
+    def plan(self, trip_specs):
+        """
+        validates and plans a batch of trips.
+
+        args:
+            trip_specs: a list of trip payloads, as accepted by TripSerializer.
+
+        returns:
+            a list of per-trip results, in the same order as trip_specs.
+        """
+        results = [None] * len(trip_specs)
+        groups = {}
+
+        for index, trip_spec in enumerate(trip_specs):
+            serializer = TripSerializer(data=trip_spec)
+            if not serializer.is_valid():
+                results[index] = {
+                    "index": index,
+                    "status": 400,
+                    "errors": serializer.errors,
+                }
+                continue
+
+            plan_key = self.plan_cache.get_plan_key(serializer.validated_data)
+            groups.setdefault(plan_key, []).append((index, serializer))
+
+        general_logger.info(
+            f"Planning batch of {len(trip_specs)} trips "
+            f"({len(groups)} distinct plans, {self.max_workers} workers)"
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for group_results in executor.map(
+                lambda item: self.plan_group(*item), groups.items()
+            ):
+                for result in group_results:
+                    results[result["index"]] = result
+
+        return results
+
+    def plan_group(self, plan_key, members):
+        """
+        plans the first trip of a group and materializes the plan for the rest.
+        """
+        try:
+            return [
+                self.plan_member(plan_key, index, serializer)
+                for index, serializer in members
+            ]
+        finally:
+            # each pool thread opens its own database connection
+            connection.close()
+
+    def plan_member(self, plan_key, index, serializer):
+        try:
+            # a trip is only committed once it is planned, a failed plan leaves none
+            with transaction.atomic():
+                trip = serializer.save(plan_key=plan_key)
+                if not self.plan_cache.materialize(trip):
+                    self.trip_calculator.plan_trip(trip)
+                trip.create_daily_logs()
+            return {
+                "index": index,
+                "status": 201,
+                "trip": TripSerializer(trip).data,
+            }
+        except Exception as e:
+            general_logger.error(f"Batch trip {index} failed: {e}")
+            return {"index": index, "status": 500, "error": str(e)}
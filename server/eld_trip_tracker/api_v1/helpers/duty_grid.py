@@ -0,0 +1,66 @@
+from array import array
+from datetime import time
+
+MINUTES_PER_DAY = 24 * 60
+
+# duty statuses indexed by their status code, in the order of the log grid rows
+STATUSES = ("off-duty", "sleeper", "driving", "on-duty")
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+def to_minute_offset(value):
+    """
+    converts a time of day into minutes since midnight. the last microsecond of
+    the day, which ends entries running up to midnight, maps to 24:00.
+    """
+    if value == time.max:
+        return MINUTES_PER_DAY
+    return value.hour * 60 + value.minute
+
+
+class DutyGrid:
+    """
+    A day's duty status entries as compact arrays of minute offsets and status codes.
+    """
+
+    __slots__ = ("starts", "ends", "statuses")
+
+    def __init__(self):
+        self.starts = array("H")
+        self.ends = array("H")
+        self.statuses = array("B")
+
+    @classmethod
+    def from_duty_statuses(cls, duty_statuses):
+        """
+        builds the grid of duty statuses ordered by start time.
+        """
+        grid = cls()
+        for duty_status in duty_statuses:
+            grid.append(
+                to_minute_offset(duty_status.start_time),
+                to_minute_offset(duty_status.end_time),
+                STATUS_CODES[duty_status.status],
+            )
+        return grid
+
+    def append(self, start, end, status_code):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.statuses.append(status_code)
+
+    def __len__(self):
+        return len(self.statuses)
+
+    def __iter__(self):
+        """yields (start minute, end minute, status code) for every entry."""
+        return zip(self.starts, self.ends, self.statuses)
+
+    def iter_transitions(self):
+        """
+        yields (minute, from status code, to status code) wherever an entry starts
+        at the minute the previous one ended.
+        """
+        for i in range(1, len(self)):
+            if self.ends[i - 1] == self.starts[i]:
+                yield self.starts[i], self.statuses[i - 1], self.statuses[i]
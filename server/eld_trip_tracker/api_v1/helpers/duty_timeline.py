@@ -0,0 +1,145 @@
+"""
+Pure functions that turn a trip's stops into per-day duty status segments.
+
+All times are integer microseconds so that day boundaries are exact. Days are
+assumed to be 24 hours long, which holds for the UTC time zone the app runs in.
+"""
+
+MICROSECONDS_PER_HOUR = 3_600_000_000
+MICROSECONDS_PER_DAY = 24 * MICROSECONDS_PER_HOUR
+
+# duty status of each stop type; the periods between stops are driving
+STOP_STATUSES = {
+    "mandatory_rest": "off-duty",
+    "rest_break": "sleeper",
+    "fuel": "on-duty",
+    "pickup": "on-duty",
+    "dropoff": "on-duty",
+}
+
+
+def build_timeline(stop_offsets, stop_durations, stop_types):
+    """
+    builds the trip's timeline: a driving period before each stop, then the stop.
+
+    args:
+        stop_offsets: start of each stop, in microseconds since the trip started,
+            in timestamp order.
+        stop_durations: duration of each stop, in microseconds.
+        stop_types: stop type of each stop.
+
+    returns:
+        a list of (event type, start, end, description) tuples.
+    """
+    timeline = []
+    current = 0
+    for offset, duration, stop_type in zip(stop_offsets, stop_durations, stop_types):
+        if offset > current:
+            timeline.append(("driving", current, offset, stop_type))
+        timeline.append((stop_type, offset, offset + duration, stop_type))
+        current = offset + duration
+    return timeline
+
+
+def split_duty_segments(
+    day_offset, stop_offsets, stop_durations, stop_types, total_duration, total_distance
+):
+    """
+    splits the trip's timeline into duty status segments that each fit in a day.
+
+    a segment running up to midnight ends at the last microsecond of its day,
+    and driving mileage is spread over the days in proportion to driving time.
+
+    args:
+        day_offset: time between midnight of the first day and the trip start,
+            in microseconds.
+        stop_offsets: start of each stop, in microseconds since the trip started,
+            in timestamp order.
+        stop_durations: duration of each stop, in microseconds.
+        stop_types: stop type of each stop.
+        total_duration: duration of the trip, in microseconds.
+        total_distance: distance of the trip, in miles.
+
+    returns:
+        a tuple of:
+            a list of (day index, start, end, status, description) segments, where
+            start and end are microseconds since midnight of that day.
+            a dictionary mapping each day index to its driving mileage.
+    """
+    last_day = (day_offset + total_duration) // MICROSECONDS_PER_DAY
+    daily_mileage = {day: 0.0 for day in range(last_day + 1)}
+    segments = []
+
+    for event_type, start, end, description in build_timeline(
+        stop_offsets, stop_durations, stop_types
+    ):
+        start += day_offset
+        end += day_offset
+        status = STOP_STATUSES.get(event_type, "driving")
+
+        day = start // MICROSECONDS_PER_DAY
+        while day <= end // MICROSECONDS_PER_DAY:
+            day_start = day * MICROSECONDS_PER_DAY
+            day_end = day_start + MICROSECONDS_PER_DAY - 1
+
+            # overlap of the event with the current day
+            overlap_start = max(start, day_start)
+            overlap_end = min(end, day_end)
+
+            if overlap_start >= overlap_end:
+                day += 1
+                continue
+
+            if event_type == "driving":
+                daily_mileage[day] = daily_mileage.get(day, 0.0) + (
+                    total_distance * (overlap_end - overlap_start) / total_duration
+                )
+
+            segments.append(
+                (
+                    day,
+                    overlap_start - day_start,
+                    overlap_end - day_start,
+                    status,
+                    description,
+                )
+            )
+
+            # move to next day if needed
+            if overlap_end == day_end:
+                day += 1
+            else:
+                break
+
+    return segments, daily_mileage
+
+
+def coalesce_segments(segments):
+    """
+    merges contiguous segments of the same day and status into one segment.
+
+    the descriptions of merged segments are kept, in order and without repeats,
+    so that the merged segment still tells which events it covers.
+
+    args:
+        segments: a list of (day index, start, end, status, description) segments,
+            in timeline order, as returned by split_duty_segments.
+
+    returns:
+        a list of segments in the same format.
+    """
+    coalesced = []
+    for day, start, end, status, description in segments:
+        if coalesced:
+            last_day, last_start, last_end, last_status, descriptions = coalesced[-1]
+            if (last_day, last_end, last_status) == (day, start, status):
+                if description not in descriptions:
+                    descriptions.append(description)
+                coalesced[-1] = (last_day, last_start, end, status, descriptions)
+                continue
+        coalesced.append((day, start, end, status, [description]))
+
+    return [
+        (day, start, end, status, ", ".join(descriptions))
+        for day, start, end, status, descriptions in coalesced
+    ]
@@ -1,13 +1,104 @@
 import base64
-import random
-from datetime import datetime
+import functools
+import json
+import math
+import tempfile
+import weakref
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
+from xml.sax.saxutils import escape
 
+from api_v1.helpers.duty_grid import STATUSES, DutyGrid
+from api_v1.helpers.render_cache import render_cache
+from api_v1.helpers.render_pool import reset_executor, submit_render
 from api_v1.lib.logger import general_logger
-from pdf2image import convert_from_bytes
+from api_v1.models import DutyStatus
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+from reportlab import rl_config
 from reportlab.lib.colors import blue, sandybrown
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
+# embed images in PDFs as binary rather than ASCII85 text, which is a quarter
+# larger and encoded in pure Python for every document
+rl_config.useA85 = 0
+
+# bump when the drawing changes, so that stale cached renderings are not served
+RENDER_VERSION = 5
+
+# files larger than this are spooled to disk while they are rendered
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# labels written under each status block, indexed by status code
+STATUS_LABELS = tuple(dict(DutyStatus.STATUS_CHOICES)[status] for status in STATUSES)
+
+BACKGROUND_IMAGE = "blank-paper-log.png"
+PAGE_SIZE = (513, 518)
+# positions on the log sheet, in PDF points from its bottom left corner
+COORD = {
+    "month": (179, 501),
+    "day": (222, 501),
+    "year": (267, 501),
+    "office_address": (236, 420),
+    "home_address": (236, 400),
+    "off_duty_hours": (472, 324),
+    "sleeper_hours": (472, 306),
+    "driving_hours": (472, 290),
+    "on_duty_hours": (472, 272),
+    "total_hours": (472, 243),
+    "from": (95, 475),
+    "to": (279, 475),
+    "carrier_name": (236, 442),
+    "truck_no": (60, 405),
+    "total_miles": (67, 437),
+    "remarks": (88, 244),
+    "grid": {
+        "start_x": 65,  # left edge of the grid
+        "start_y_off_duty": 325,  # y for "off duty" row
+        "start_y_sleeper": 308,  # y for "sleeper berth" row
+        "start_y_driving": 291,  # y for "driving" row
+        "start_y_on_duty": 274,  # y for "on duty" row
+        "hour_width": 16.1,  # width of each hour column
+    },
+}
+# y position of each status row, indexed by status code
+STATUS_Y = (
+    COORD["grid"]["start_y_off_duty"],
+    COORD["grid"]["start_y_sleeper"],
+    COORD["grid"]["start_y_driving"],
+    COORD["grid"]["start_y_on_duty"],
+)
+TEXT_FONT_SIZE = 10
+REMARK_FONT_SIZE = 6
+REMARK_OFFSET = 85  # distance between a status line and its remark
+LINE_WIDTH = 2
+# JPEG quality of the log sheet background embedded in PDF logs
+PDF_BACKGROUND_QUALITY = 90
+# resolution of the PNG logs, the same as the former PDF to PNG conversion
+RASTER_DPI = 200
+BLUE = (0, 0, 255)
+SANDYBROWN = (244, 164, 96)
+# image profiles selectable per request: resolution and encoding. palette PNGs
+# are reduced to the handful of colors the log sheet is drawn with
+RENDER_PROFILES = {
+    "full": {"dpi": RASTER_DPI, "format": "png"},
+    "palette": {"dpi": RASTER_DPI, "format": "png", "palette": True},
+    "webp": {"dpi": RASTER_DPI, "format": "webp", "quality": 80},
+    "thumbnail": {"dpi": 60, "format": "webp", "quality": 75},
+    "print": {"dpi": 300, "format": "png"},
+}
+DEFAULT_PROFILE = "full"
+BLUE_HEX = "#0000ff"
+SANDYBROWN_HEX = "#f4a460"
+# header fields that are the same on every log, drawn once into the log sheet template
+STATIC_FIELDS = {
+    "office_address": "4488 Richards Avenue Stockton, CA 95202",
+    "home_address": "1037 Diane Street Arroyo Grande, CA 93420",
+    "carrier_name": "Runor Trucks",
+}
+
 
 class ELDLog:
     """
@@ -22,328 +113,698 @@ class ELDLog:
             daily_log: the daily log object.
 
         returns:
-            a list of dictionaries, where each dictionary represents a duty status entry.
+            a DutyGrid holding the minute offsets and status codes of the entries.
         """
-        grid = []
-
-        for status in daily_log.duty_statuses.order_by("start_time"):
-            status_start_time = datetime.combine(daily_log.date, status.start_time)
-            status_end_time = datetime.combine(daily_log.date, status.end_time)
-
-            grid.append(
-                {
-                    "start": status_start_time.strftime("%H:%M"),
-                    "end": status_end_time.strftime("%H:%M"),
-                    "status": status.status,
-                    "notes": status.get_status_display(),
-                }
-            )
+        return DutyGrid.from_duty_statuses(daily_log.get_ordered_duty_statuses())
 
-        return grid
-
-    def generate_eld_logs(self, trip, daily_logs):
+    def iter_eld_logs(self, trip, daily_logs, include_pdf=True):
         """
-        generates ELD logs for a trip, including PDF and image formats.
+        generates ELD logs for a trip one day at a time.
 
         args:
             trip: the trip object.
             daily_logs: a list of daily log objects.
+            include_pdf: whether to render the PDF of each log as well as its image.
+                when False, pdf_base64 is None.
 
-        returns:
-            a list of dictionaries, where each dictionary represents an ELD log.
+        yields:
+            a dictionary representing the ELD log of each day.
         """
-        eld_logs = []
+        # days are submitted ahead of the one being yielded, as many as there are
+        # render processes, so that they render in parallel while only a few
+        # renderings are held in memory at once. days are yielded in date order
+        window = max(1, settings.ELD_RENDER_WORKERS)
+        renders = deque()
         for daily_log in daily_logs:
             general_logger.info(f"Generating ELD log for date: {daily_log.date}")
-            grid = self.generate_log_grid(daily_log)
-            log_data = self.get_log_metadata(trip, grid)
-            log_data["entries"] = grid
-            log_data["total_miles"] = round(daily_log.total_miles, 2)
-            pdf_base64, img_base64 = self.generate_eld_log(
-                output_path=f"outputs/daily_log_{daily_log.date}.pdf",
-                background_image="blank-paper-log.png",
-                daily_data=log_data,
+            log_data = self.get_log_data(trip, daily_log)
+            renders.append(
+                (
+                    daily_log,
+                    log_data,
+                    submit_render(BACKGROUND_IMAGE, log_data, include_pdf),
+                )
             )
+            if len(renders) >= window:
+                yield self.collect_render(*renders.popleft(), include_pdf)
 
-            eld_logs.append(
-                {
-                    "date": daily_log.date,
-                    "total_miles": daily_log.total_miles,
-                    "pdf_base64": pdf_base64,
-                    "img_base64": img_base64,
-                }
+        while renders:
+            yield self.collect_render(*renders.popleft(), include_pdf)
+
+    def collect_render(self, daily_log, log_data, render, include_pdf):
+        """
+        waits for the rendering of a day and returns its ELD log.
+        """
+        try:
+            pdf_value, img_value = render.result()
+        except BrokenProcessPool as e:
+            general_logger.warning(f"ELD render pool failed, rendering inline: {e}")
+            reset_executor()
+            pdf_value, img_value = self.render_cached_eld_log(
+                BACKGROUND_IMAGE, log_data, include_pdf
             )
-            general_logger.info(
-                f"ELD log generated successfully for date: {daily_log.date}"
+
+        general_logger.info(
+            f"ELD log generated successfully for date: {daily_log.date}"
+        )
+        return {
+            "date": daily_log.date,
+            "total_miles": daily_log.total_miles,
+            "pdf_base64": (
+                base64.b64encode(pdf_value).decode("utf-8") if pdf_value else None
+            ),
+            "img_base64": base64.b64encode(img_value).decode("utf-8"),
+        }
+
+    def get_log_data(self, trip, daily_log):
+        """
+        gathers everything drawn on the ELD log of a day: its metadata and grid.
+        """
+        log_data = self.get_log_metadata(trip, daily_log)
+        log_data["entries"] = self.generate_log_grid(daily_log)
+        log_data["total_miles"] = round(daily_log.total_miles, 2)
+        return log_data
+
+    def open_trip_pdf(self, trip, daily_logs):
+        """
+        opens a single PDF holding the ELD logs of a whole trip, one page per day.
+
+        the pages share the log sheet background, so the file is several times
+        smaller than the PDFs of the days taken separately. it is written to a
+        spooled temporary file, which only stays in memory while it is small.
+
+        args:
+            trip: the trip object.
+            daily_logs: a list of daily log objects, in date order.
+
+        returns:
+            a tuple of the PDF file, opened for binary reading, and the render
+            cache key identifying its content.
+        """
+        days_data = [self.get_log_data(trip, daily_log) for daily_log in daily_logs]
+        key = render_cache.get_key(
+            [self.get_render_key(BACKGROUND_IMAGE, data) for data in days_data]
+        )
+        pdf_file = render_cache.open(key, "pdf")
+        if pdf_file:
+            general_logger.info(f"Render cache hit for trip PDF: {key}")
+            return pdf_file, key
+
+        pdf_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        c = canvas.Canvas(pdf_file, pagesize=PAGE_SIZE, invariant=1)
+        for daily_data in days_data:
+            self.draw_eld_log_page(c, BACKGROUND_IMAGE, daily_data)
+            c.showPage()
+        c.save()
+
+        pdf_file.seek(0)
+        render_cache.put_file(key, "pdf", pdf_file)
+        pdf_file.seek(0)
+        general_logger.info(f"Trip PDF generated with {len(days_data)} pages")
+        return pdf_file, key
+
+    def get_render_key(self, background_image, daily_data):
+        """
+        returns the render cache key of the ELD log of a day.
+
+        a log is drawn the same, byte for byte, from the same data, so the key
+        also identifies the content of its files.
+        """
+        return render_cache.get_key(
+            {
+                "version": RENDER_VERSION,
+                "background_image": background_image,
+                "entries": list(daily_data["entries"]),
+                **{
+                    field: value
+                    for field, value in daily_data.items()
+                    if field != "entries"
+                },
+            }
+        )
+
+    def render_cached_eld_log(self, background_image, daily_data, include_pdf=True):
+        """
+        renders the ELD log of a day, reusing a previous rendering of the same content.
+
+        args:
+            background_image: the path to the background image.
+            daily_data: a dictionary containing the daily log data.
+            include_pdf: whether to render the PDF as well as the image.
+
+        returns:
+            a tuple containing the PDF and PNG file contents. the PDF is None unless
+            include_pdf is set.
+        """
+        key = self.get_render_key(background_image, daily_data)
+        img_value = self.render_cached_artifact(
+            background_image, daily_data, "png", key
+        )
+        pdf_value = None
+        if include_pdf:
+            pdf_value = self.render_cached_artifact(
+                background_image, daily_data, "pdf", key
             )
+        return pdf_value, img_value
 
-        return eld_logs
+    def render_cached_artifact(
+        self, background_image, daily_data, extension, key, profile=DEFAULT_PROFILE
+    ):
+        """
+        renders the PDF or image file of the ELD log of a day, unless it is cached.
+
+        args:
+            background_image: the path to the background image.
+            daily_data: a dictionary containing the daily log data.
+            extension: "pdf", or the format of the image profile.
+            key: the render key of the log.
+            profile: the name of the render profile of an image.
+
+        returns:
+            the file content.
+        """
+        with self.open_cached_artifact(
+            background_image, daily_data, extension, key, profile
+        ) as f:
+            return f.read()
+
+    def open_cached_artifact(
+        self,
+        background_image,
+        daily_data,
+        extension,
+        key,
+        profile=DEFAULT_PROFILE,
+        refresh=False,
+    ):
+        """
+        opens the cached PDF or image file of the ELD log of a day, rendering it
+        first on a cache miss. takes the same arguments as render_cached_artifact,
+        and refresh to render the file again even if it is cached.
+
+        returns:
+            the file, opened for binary reading.
+        """
+        cache_extension = extension
+        if extension != "pdf" and profile != DEFAULT_PROFILE:
+            cache_extension = f"{profile}.{extension}"
+
+        f = None if refresh else render_cache.open(key, cache_extension)
+        if f:
+            general_logger.info(f"Render cache hit for {cache_extension}: {key}")
+            return f
+
+        if extension == "pdf":
+            content = self.render_eld_log_pdf(background_image, daily_data)
+        else:
+            content = self.render_eld_log_image(background_image, daily_data, profile)
+        render_cache.put(key, cache_extension, content)
+        return BytesIO(content)
+
+    def open_eld_log_artifact(
+        self, trip, daily_log, extension, profile=DEFAULT_PROFILE
+    ):
+        """
+        opens a file of the ELD log of a single day.
+
+        args:
+            trip: the trip object.
+            daily_log: the daily log object.
+            extension: "pdf", "svg", "json" for the drawing list, or the format
+                of the image profile.
+            profile: the name of the render profile of an image.
+
+        returns:
+            a tuple of the file, opened for binary reading, and a key identifying
+            its content.
+        """
+        log_data = self.get_log_data(trip, daily_log)
+        key = self.get_render_key(BACKGROUND_IMAGE, log_data)
+        content_key = f"{key}.{profile}.{extension}"
+        # vector outputs are cheaper to draw than to look up in the cache
+        if extension == "svg":
+            return BytesIO(self.render_eld_log_svg(log_data)), content_key
+        if extension == "json":
+            drawing = json.dumps(self.get_log_drawing(log_data)).encode("utf-8")
+            return BytesIO(drawing), content_key
+        artifact = self.open_cached_artifact(
+            BACKGROUND_IMAGE, log_data, extension, key, profile
+        )
+        return artifact, content_key
 
-    def get_log_metadata(self, trip, entries):
+    def get_log_metadata(self, trip, daily_log):
         """
-        gets metadata for the ELD log, such as remarks, dates, addresses, and duty hours.
+        gets metadata for the ELD log, such as dates, addresses, and duty hours.
 
         args:
             trip: the trip object.
-            entries: a list of duty status entries.
+            daily_log: the daily log object.
 
         returns:
             a dictionary containing the log metadata.
         """
         data = {
-            "remarks": "",
-            "month": datetime.now().strftime("%m"),
-            "day": datetime.now().strftime("%d"),
-            "year": datetime.now().strftime("%Y"),
-            "office_address": "4488 Richards Avenue Stockton, CA 95202",
-            "home_address": "1037 Diane Street Arroyo Grande, CA 93420",
+            "month": daily_log.date.strftime("%m"),
+            "day": daily_log.date.strftime("%d"),
+            "year": daily_log.date.strftime("%Y"),
             "from": trip.current_location_name[:30]
             + ("..." if len(trip.current_location_name) > 30 else ""),
             "to": trip.dropoff_location_name[:30]
             + ("..." if len(trip.dropoff_location_name) > 30 else ""),
-            "carrier_name": "Runor Trucks",
-            "truck_no": str(random.randint(1000, 9999)),
+            # a stand-in truck number, the same on every log of the trip
+            "truck_no": str(1000 + trip.id.int % 9000),
+            **STATIC_FIELDS,
         }
 
-        duty_hours = {"off_duty": 0.0, "sleeper": 0.0, "driving": 0.0, "on_duty": 0.0}
+        # duty hours are computed once when the daily log is created
+        data.update(
+            {
+                "off_duty": daily_log.off_duty_hours,
+                "sleeper": daily_log.sleeper_hours,
+                "driving": daily_log.driving_hours,
+                "on_duty": daily_log.on_duty_hours,
+                "total_hours": daily_log.total_hours,
+            }
+        )
 
-        for entry in entries:
-            start = datetime.strptime(entry["start"], "%H:%M")
-            end = datetime.strptime(entry["end"], "%H:%M")
+        general_logger.info(f"Log metadata: {data}")
+        return data
 
-            # handle midnight crossover (e.g., 23:30 to 01:00)
-            if end < start:
-                end = end.replace(day=end.day + 1)
+    def process_entries(self, grid):
+        """
+        identifies transitions between consecutive duty status entries.
 
-            duration = (end - start).total_seconds() / 3600  # convert to hours
-            duty_hours[entry["status"].replace("-", "_")] += duration
+        args:
+            grid: the DutyGrid of the day.
 
-        total_hours = sum(duty_hours.values())
-        data.update(duty_hours)
-        data["total_hours"] = total_hours
+        returns:
+            a list of (minute, from status code, to status code) transitions.
+        """
+        transitions = list(grid.iter_transitions())
+        general_logger.info(f"Processed entries, found {len(transitions)} transitions")
+        return transitions
 
-        general_logger.info(f"Log metadata: {data}")
-        return data
+    def get_text_fields(self, daily_data):
+        """
+        returns the (x, y, text) of every text field that varies between logs, in
+        PDF points. the static fields are part of the log sheet template.
+        """
+        fields = [
+            ("total_miles", str(daily_data["total_miles"])),
+            ("month", str(daily_data["month"])),
+            ("day", str(daily_data["day"])),
+            ("year", str(daily_data["year"])),
+            ("from", daily_data["from"]),
+            ("to", daily_data["to"]),
+            ("truck_no", daily_data["truck_no"]),
+            ("off_duty_hours", f"{daily_data['off_duty']:.1f}"),
+            ("sleeper_hours", f"{daily_data['sleeper']:.1f}"),
+            ("driving_hours", f"{daily_data['driving']:.1f}"),
+            ("on_duty_hours", f"{daily_data['on_duty']:.1f}"),
+            ("total_hours", f"{daily_data['total_hours']:.1f}"),
+        ]
+        return [(*COORD[field], text) for field, text in fields]
+
+    def layout_grid(self, grid):
+        """
+        positions the entries and transitions of a day on the 24-hour grid.
+
+        args:
+            grid: the DutyGrid of the day.
+
+        returns:
+            a tuple of:
+                a list of (x start, x end, y, label) status blocks.
+                a list of (x, from y, to y) transition lines.
+            all in PDF points.
+        """
+        layout = COORD["grid"]
+        minute_width = layout["hour_width"] / 60
+        blocks = [
+            (
+                layout["start_x"] + start * minute_width,
+                layout["start_x"] + end * minute_width,
+                STATUS_Y[status_code],
+                STATUS_LABELS[status_code],
+            )
+            for start, end, status_code in grid
+        ]
+        transitions = [
+            (
+                layout["start_x"] + minute * minute_width,
+                STATUS_Y[from_status],
+                STATUS_Y[to_status],
+            )
+            for minute, from_status, to_status in self.process_entries(grid)
+        ]
+        return blocks, transitions
+
+    def get_log_drawing(self, daily_data):
+        """
+        lays out the ELD log of a day as a list of drawing operations, for clients
+        that draw it over the log sheet themselves.
+
+        coordinates are in PDF points from the top left corner of the log sheet,
+        the same layout as render_eld_log_pdf. the static header fields are part
+        of the log sheet and are not included.
+
+        args:
+            daily_data: a dictionary containing the daily log data.
+
+        returns:
+            a dictionary with the page width and height, and a list of operations:
+                {"op": "text", "x", "y", "text", "size", "color", "rotate"}, with x
+                and y the start of the baseline and rotate the counterclockwise
+                rotation in degrees.
+                {"op": "line", "x1", "y1", "x2", "y2", "width", "color"}.
+        """
+        width, height = PAGE_SIZE
+        operations = [
+            {
+                "op": "text",
+                "x": round(x, 2),
+                "y": round(height - y, 2),
+                "text": text,
+                "size": TEXT_FONT_SIZE,
+                "color": SANDYBROWN_HEX,
+                "rotate": 0,
+            }
+            for x, y, text in self.get_text_fields(daily_data)
+            if text
+        ]
+
+        def line(x1, y1, x2, y2):
+            return {
+                "op": "line",
+                "x1": round(x1, 2),
+                "y1": round(height - y1, 2),
+                "x2": round(x2, 2),
+                "y2": round(height - y2, 2),
+                "width": LINE_WIDTH,
+                "color": BLUE_HEX,
+            }
+
+        blocks, transitions = self.layout_grid(daily_data["entries"])
+        for x_start, x_end, y, label in blocks:
+            operations.append(line(x_start, y, x_end, y))
+            operations.append(
+                {
+                    "op": "text",
+                    "x": round(x_start + ((x_end - x_start) // 2), 2),
+                    "y": round(height - (y - REMARK_OFFSET), 2),
+                    "text": label,
+                    "size": REMARK_FONT_SIZE,
+                    "color": SANDYBROWN_HEX,
+                    "rotate": 90,
+                }
+            )
+        for x, from_y, to_y in transitions:
+            operations.append(line(x, from_y, x, to_y))
+
+        return {"width": width, "height": height, "operations": operations}
 
-    def process_entries(self, entries):
+    def render_eld_log_svg(self, daily_data):
         """
-        processes and sorts the duty status entries, identifying transitions between statuses.
+        draws the ELD log of a day as an SVG overlay for the log sheet, without
+        the background.
 
         args:
-            entries: a list of duty status entries.
+            daily_data: a dictionary containing the daily log data.
 
         returns:
-            a tuple containing the sorted entries and a list of transitions.
-        """
-        sorted_entries = sorted(entries, key=lambda x: x["start"])
-        transitions = []
-
-        for i in range(1, len(sorted_entries)):
-            prev_end = sorted_entries[i - 1]["end"]
-            curr_start = sorted_entries[i]["start"]
-
-            if prev_end == curr_start:
-                transitions.append(
-                    {
-                        "time": prev_end,
-                        "from_status": sorted_entries[i - 1]["status"],
-                        "to_status": sorted_entries[i]["status"],
-                    }
+            the SVG file content.
+        """
+        drawing = self.get_log_drawing(daily_data)
+        width, height = drawing["width"], drawing["height"]
+        elements = []
+        for operation in drawing["operations"]:
+            if operation["op"] == "line":
+                elements.append(
+                    f'<line x1="{operation["x1"]}" y1="{operation["y1"]}" '
+                    f'x2="{operation["x2"]}" y2="{operation["y2"]}" '
+                    f'stroke="{operation["color"]}" '
+                    f'stroke-width="{operation["width"]}"/>'
+                )
+            else:
+                x, y = operation["x"], operation["y"]
+                rotate = (
+                    f' transform="rotate({-operation["rotate"]} {x} {y})"'
+                    if operation["rotate"]
+                    else ""
                 )
+                elements.append(
+                    f'<text x="{x}" y="{y}" font-size="{operation["size"]}" '
+                    f'fill="{operation["color"]}"{rotate}>'
+                    f'{escape(operation["text"])}</text>'
+                )
+
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" '
+            f'height="{height}" viewBox="0 0 {width} {height}" '
+            'font-family="Helvetica, Arial, sans-serif">' + "".join(elements) + "</svg>"
+        ).encode("utf-8")
+
+    def render_log_sheet_png(self, background_image):
+        """
+        returns the PNG of the log sheet with its static header fields, the
+        background that the SVG and drawing list outputs are drawn over.
+        """
+        return encode_log_sheet_png(background_image, RASTER_DPI / 72)
 
-        general_logger.info(f"Processed entries, found transitions: {transitions}")
-        return sorted_entries, transitions
+    def get_log_sheet_key(self, background_image):
+        """
+        returns the key identifying the content of the log sheet PNG.
+        """
+        return render_cache.get_key(
+            {"version": RENDER_VERSION, "log_sheet": background_image}
+        )
 
-    def generate_eld_log(self, output_path, background_image, daily_data):
+    def render_eld_log_pdf(self, background_image, daily_data):
         """
-        generates the ELD log PDF and image files.
+        draws the ELD log of a day as a PDF.
 
         args:
-            output_path: the path to save the PDF file.
             background_image: the path to the background image.
             daily_data: a dictionary containing the daily log data.
 
         returns:
-            a tuple containing the base64 encoded PDF and image data.
+            the PDF file content.
         """
-        custom_page_size = (513, 518)
         buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=custom_page_size)
-        c.drawImage(
-            background_image,
-            0,
-            0,
-            width=custom_page_size[0],
-            height=custom_page_size[1],
-        )
+        # invariant leaves out the creation date, so the same log is the same file
+        c = canvas.Canvas(buffer, pagesize=PAGE_SIZE, invariant=1)
+        self.draw_eld_log_page(c, background_image, daily_data)
+        c.save()
+        pdf_value = buffer.getvalue()
+        buffer.close()
+        return pdf_value
 
-        coord = {
-            "month": (179, 501),
-            "day": (222, 501),
-            "year": (267, 501),
-            "office_address": (236, 420),
-            "home_address": (236, 400),
-            "off_duty_hours": (472, 324),
-            "sleeper_hours": (472, 306),
-            "driving_hours": (472, 290),
-            "on_duty_hours": (472, 272),
-            "total_hours": (472, 243),
-            "from": (95, 475),
-            "to": (279, 475),
-            "carrier_name": (236, 442),
-            "truck_no": (60, 405),
-            "total_miles": (67, 437),
-            "remarks": (88, 244),
-            "grid": {
-                "start_x": 65,  # left edge of the grid
-                "start_y_off_duty": 325,  # y for "off duty" row
-                "start_y_sleeper": 308,  # y for "sleeper berth" row
-                "start_y_driving": 291,  # y for "driving" row
-                "start_y_on_duty": 274,  # y for "on duty" row
-                "hour_width": 16.1,  # width of each hour column
-            },
-        }
+    def draw_eld_log_page(self, c, background_image, daily_data):
+        """
+        draws the ELD log of a day on the current page of a reportlab canvas.
+        """
+        get_pdf_template(background_image).draw(c)
 
-        c.setFont("Helvetica", 10)
+        c.setFont("Helvetica", TEXT_FONT_SIZE)
         c.setFillColor(sandybrown)
-        c.drawString(
-            coord["total_miles"][0],
-            coord["total_miles"][1],
-            str(daily_data["total_miles"]),
-        )
-        c.drawString(coord["month"][0], coord["month"][1], str(daily_data["month"]))
-        c.drawString(coord["day"][0], coord["day"][1], str(daily_data["day"]))
-        c.drawString(coord["year"][0], coord["year"][1], str(daily_data["year"]))
-        c.drawString(
-            coord["office_address"][0],
-            coord["office_address"][1],
-            daily_data["office_address"],
-        )
-        c.drawString(
-            coord["home_address"][0],
-            coord["home_address"][1],
-            daily_data["home_address"],
-        )
-        c.drawString(coord["from"][0], coord["from"][1], daily_data["from"])
-        c.drawString(coord["to"][0], coord["to"][1], daily_data["to"])
-        c.drawString(
-            coord["carrier_name"][0],
-            coord["carrier_name"][1],
-            daily_data["carrier_name"],
-        )
-        c.drawString(coord["truck_no"][0], coord["truck_no"][1], daily_data["truck_no"])
-        c.drawString(
-            coord["off_duty_hours"][0],
-            coord["off_duty_hours"][1],
-            f"{daily_data['off_duty']:.1f}",
-        )
-        c.drawString(
-            coord["sleeper_hours"][0],
-            coord["sleeper_hours"][1],
-            f"{daily_data['sleeper']:.1f}",
-        )
-        c.drawString(
-            coord["driving_hours"][0],
-            coord["driving_hours"][1],
-            f"{daily_data['driving']:.1f}",
-        )
-        c.drawString(
-            coord["on_duty_hours"][0],
-            coord["on_duty_hours"][1],
-            f"{daily_data['on_duty']:.1f}",
-        )
-        c.drawString(
-            coord["total_hours"][0],
-            coord["total_hours"][1],
-            f"{daily_data['total_hours']:.1f}",
-        )
-
-        sorted_entries, transitions = self.process_entries(daily_data["entries"])
+        for x, y, text in self.get_text_fields(daily_data):
+            c.drawString(x, y, text)
 
         # fill in the 24-hour grid
-        grid = coord["grid"]
-        for entry in sorted_entries:
-            # parse start/end times (e.g., "17:41" → 17.683 hours)
-            start = datetime.strptime(entry["start"], "%H:%M")
-            end = datetime.strptime(entry["end"], "%H:%M")
-            start_hour = start.hour + start.minute / 60
-            end_hour = end.hour + end.minute / 60
-
-            # determine y position based on status
-            status_y = {
-                "off-duty": grid["start_y_off_duty"],
-                "sleeper": grid["start_y_sleeper"],
-                "driving": grid["start_y_driving"],
-                "on-duty": grid["start_y_on_duty"],
-            }[entry["status"]]
-
-            # calculate x positions for the time block
-            x_start = grid["start_x"] + (start_hour * grid["hour_width"])
-            x_end = grid["start_x"] + (end_hour * grid["hour_width"])
-
-            c.setStrokeColor(blue)
-            c.setLineWidth(2)
-            c.line(x_start, status_y, x_end, status_y)
+        blocks, transitions = self.layout_grid(daily_data["entries"])
+        c.setStrokeColor(blue)
+        c.setLineWidth(LINE_WIDTH)
+        for x_start, x_end, y, label in blocks:
+            c.line(x_start, y, x_end, y)
 
             # add vertical remarks at the end of each status block
-            if "notes" in entry and entry["notes"]:
-                remark_x = x_start + ((x_end - x_start) // 2)
-                remark_y = status_y - 85  # start point below the status line
-
-                # rotate the canvas to write vertically
-                c.saveState()
-                c.translate(remark_x, remark_y)  # move origin to the remark position
-                c.rotate(90)
-                c.setFont("Helvetica", 6)
-                c.drawString(0, 0, entry["notes"])
-                c.restoreState()  # restore the canvas state
+            remark_x = x_start + ((x_end - x_start) // 2)
+            remark_y = y - REMARK_OFFSET  # start point below the status line
+
+            # rotate the canvas to write vertically
+            c.saveState()
+            c.translate(remark_x, remark_y)  # move origin to the remark position
+            c.rotate(90)
+            c.setFont("Helvetica", REMARK_FONT_SIZE)
+            c.drawString(0, 0, label)
+            c.restoreState()  # restore the canvas state
 
         # draw vertical lines for transitions
-        c.setStrokeColor(blue)
-        c.setLineWidth(2)
-        for transition in transitions:
-            transition_time = datetime.strptime(transition["time"], "%H:%M")
-            transition_hour = transition_time.hour + transition_time.minute / 60
-            x_transition = grid["start_x"] + (transition_hour * grid["hour_width"])
-
-            from_status_y = {
-                "off-duty": grid["start_y_off_duty"],
-                "sleeper": grid["start_y_sleeper"],
-                "driving": grid["start_y_driving"],
-                "on-duty": grid["start_y_on_duty"],
-            }[transition["from_status"]]
-
-            to_status_y = {
-                "off-duty": grid["start_y_off_duty"],
-                "sleeper": grid["start_y_sleeper"],
-                "driving": grid["start_y_driving"],
-                "on-duty": grid["start_y_on_duty"],
-            }[transition["to_status"]]
-
-            c.line(x_transition, from_status_y, x_transition, to_status_y)
+        for x, from_y, to_y in transitions:
+            c.line(x, from_y, x, to_y)
 
-        c.save()
-        pdf_value = buffer.getvalue()
-        pdf_base64 = base64.b64encode(pdf_value).decode("utf-8")
-
-        # save the PDF to a file in development
-        # with open(output_path, "wb") as pdf_file:
-        #     pdf_file.write(pdf_value)
-        # general_logger.info(f"PDF saved to {output_path}")
-
-        # convert PDF to image
-        images = convert_from_bytes(pdf_value, fmt="png")
-        img_base64 = None
-        if images:
-            image = images[0]
-            img_buffer = BytesIO()
-            image.save(img_buffer, format="PNG")
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode("utf-8")
-            general_logger.info("PDF converted to image successfully")
+    def render_eld_log_image(self, background_image, daily_data, profile):
+        """
+        draws the ELD log of a day as an image, straight onto the background.
+
+        the layout matches render_eld_log_pdf, scaled from PDF points to pixels at
+        the resolution of the profile. no PDF is involved.
+
+        args:
+            background_image: the path to the background image.
+            daily_data: a dictionary containing the daily log data.
+            profile: the name of the render profile, in RENDER_PROFILES.
+
+        returns:
+            the image file content, in the format of the profile.
+        """
+        render_profile = RENDER_PROFILES[profile]
+        scale = render_profile["dpi"] / 72
+        image = load_raster_template(background_image, scale).copy()
+        draw = ImageDraw.Draw(image)
+
+        def to_pixels(x, y):
+            return x * scale, (PAGE_SIZE[1] - y) * scale
+
+        text_font = load_font(round(TEXT_FONT_SIZE * scale))
+        for x, y, text in self.get_text_fields(daily_data):
+            draw.text(
+                to_pixels(x, y), text, fill=SANDYBROWN, font=text_font, anchor="ls"
+            )
+
+        # fill in the 24-hour grid
+        blocks, transitions = self.layout_grid(daily_data["entries"])
+        line_width = max(1, round(LINE_WIDTH * scale))
+        remark_font = load_font(round(REMARK_FONT_SIZE * scale))
+        for x_start, x_end, y, label in blocks:
+            draw.line(
+                [to_pixels(x_start, y), to_pixels(x_end, y)],
+                fill=BLUE,
+                width=line_width,
+            )
+
+            # write the remark vertically, reading upwards from below the line
+            remark_x, remark_y = to_pixels(
+                x_start + ((x_end - x_start) // 2), y - REMARK_OFFSET
+            )
+            ascent, descent = remark_font.getmetrics()
+            width = math.ceil(remark_font.getlength(label))
+            remark = Image.new("RGBA", (width, ascent + descent))
+            ImageDraw.Draw(remark).text(
+                (0, ascent), label, fill=SANDYBROWN, font=remark_font, anchor="ls"
+            )
+            remark = remark.rotate(90, expand=True)
+            # the baseline start moves from (0, ascent) to (ascent, width)
+            position = (round(remark_x) - ascent, round(remark_y) - width)
+            image.paste(remark, position, remark)
+
+        # draw vertical lines for transitions
+        for x, from_y, to_y in transitions:
+            draw.line(
+                [to_pixels(x, from_y), to_pixels(x, to_y)], fill=BLUE, width=line_width
+            )
+
+        buffer = BytesIO()
+        if render_profile["format"] == "webp":
+            image.save(buffer, format="WEBP", quality=render_profile["quality"])
+        elif render_profile.get("palette"):
+            image.quantize(palette=load_palette(), dither=Image.Dither.NONE).save(
+                buffer, format="PNG", optimize=True
+            )
         else:
-            img_base64 = None
-            general_logger.warning("Failed to convert PDF to image")
+            image.save(buffer, format="PNG")
+        general_logger.info(f"ELD log image rendered with the {profile} profile")
+        return buffer.getvalue()
 
-        buffer.close()
 
-        return pdf_base64, img_base64
+class LogSheetTemplate:
+    """
+    The blank log sheet and its static header fields, prepared once per process.
+
+    reportlab compresses an image again for every document it is drawn into,
+    which is most of the cost of a one page log. The template encodes the
+    background once as a JPEG, which reportlab embeds into each document as it
+    is. The background is wrapped with the static fields in a form that every
+    page of the document draws by reference.
+    """
+
+    form_name = "log_sheet"
+
+    def __init__(self, background_image):
+        buffer = BytesIO()
+        load_background(background_image, 1).save(
+            buffer, format="JPEG", quality=PDF_BACKGROUND_QUALITY
+        )
+        self.background = buffer.getvalue()
+        # canvases the form is defined in
+        self.canvases = weakref.WeakSet()
+
+    def define(self, c):
+        """defines the template form in the canvas' document."""
+        c.beginForm(self.form_name)
+        c.drawImage(ImageReader(BytesIO(self.background)), 0, 0, *PAGE_SIZE)
+        c.setFont("Helvetica", TEXT_FONT_SIZE)
+        c.setFillColor(sandybrown)
+        for field, text in STATIC_FIELDS.items():
+            c.drawString(*COORD[field], text)
+        c.endForm()
+        self.canvases.add(c)
+
+    def draw(self, c):
+        """draws the template on the current page of the canvas."""
+        if c not in self.canvases:
+            self.define(c)
+        c.doForm(self.form_name)
+
+
+@functools.lru_cache(maxsize=8)
+def get_pdf_template(path):
+    return LogSheetTemplate(path)
+
+
+@functools.lru_cache(maxsize=8)
+def load_background(path, scale):
+    """
+    loads the log sheet background once per process, flattened onto white paper
+    and resized to the given scale of the page size.
+    """
+    background = Image.open(path).convert("RGBA")
+    paper = Image.new("RGBA", background.size, "white")
+    paper.alpha_composite(background)
+    size = (round(PAGE_SIZE[0] * scale), round(PAGE_SIZE[1] * scale))
+    return paper.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+
+
+@functools.lru_cache(maxsize=8)
+def load_raster_template(path, scale):
+    """
+    returns the background at the given scale with the static header fields
+    already drawn on it.
+    """
+    image = load_background(path, scale).copy()
+    draw = ImageDraw.Draw(image)
+    font = load_font(round(TEXT_FONT_SIZE * scale))
+    for field, text in STATIC_FIELDS.items():
+        x, y = COORD[field]
+        position = (x * scale, (PAGE_SIZE[1] - y) * scale)
+        draw.text(position, text, fill=SANDYBROWN, font=font, anchor="ls")
+    return image
+
+
+@functools.lru_cache(maxsize=8)
+def encode_log_sheet_png(path, scale):
+    buffer = BytesIO()
+    load_raster_template(path, scale).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=1)
+def load_palette():
+    """
+    returns the palette of palette PNGs: shades of gray for the log sheet, and
+    tints of the two colors the logs are drawn with for their antialiased edges.
+    """
+    colors = [(round(255 * i / 7),) * 3 for i in range(8)]
+    for color in (BLUE, SANDYBROWN):
+        colors += [
+            tuple(round(value + (255 - value) * i / 4) for value in color)
+            for i in range(4)
+        ]
+    palette = Image.new("P", (1, 1))
+    palette.putpalette([value for color in colors for value in color])
+    return palette
+
+
+@functools.lru_cache(maxsize=8)
+def load_font(size):
+    return ImageFont.load_default(size=size)
@@ -4,7 +4,6 @@ import polyline
 from api_v1.helpers.distance import Distance
 from api_v1.lib.logger import general_logger
 from api_v1.lib.mapbox import MapBoxAPI
-from api_v1.models import Stop
 from django.contrib.gis.geos import LineString, Point
 from django.utils import timezone
 
@@ -17,12 +16,15 @@ class FuelStop:
     This class provides methods to find optimal fuel stops and add them to a trip route.
     """
 
-    def __init__(self):
+    def __init__(self, mapbox_api=None):
         """
         Initializes the FuelStop object with Distance and MapBoxAPI instances.
+
+        Args:
+            mapbox_api (MapBoxAPI, optional): A shared MapBoxAPI instance to use.
         """
         self.distance = Distance()
-        self.mapbox_api = MapBoxAPI()
+        self.mapbox_api = mapbox_api or MapBoxAPI()
 
     def find_optimal_fuel_stop(self, route_geometry, max_distance):
         """Find best fuel station within search window using Mapbox
@@ -102,8 +104,7 @@ class FuelStop:
             coords_list.append((trip.pickup_location.x, trip.pickup_location.y))
             coords_list.append((trip.dropoff_location.x, trip.dropoff_location.y))
 
-            Stop.objects.create(
-                route=route,
+            route.add_stop(
                 stop_type="pickup",
                 location=Point(
                     trip.pickup_location.x, trip.pickup_location.y, srid=4326
@@ -111,8 +112,7 @@ class FuelStop:
                 duration=1,  # 30 minutes for fueling
                 timestamp=timezone.now() + timedelta(hours=pickup_duration),
             )
-            Stop.objects.create(
-                route=route,
+            route.add_stop(
                 stop_type="dropoff",
                 location=Point(
                     trip.dropoff_location.x, trip.dropoff_location.y, srid=4326
@@ -122,7 +122,8 @@ class FuelStop:
             )
             trip.total_duration = total_duration
             trip.total_distance = total_distance_travelled
-            trip.save()
+            if not route.is_planned_in_memory:
+                trip.save()
             general_logger.info(
                 "Trip completed without fuel stops as initial distance was short."
             )
@@ -131,8 +132,7 @@ class FuelStop:
         if pickup_distance < 1000:
             coords_list.append((trip.pickup_location.x, trip.pickup_location.y))
             # add stop for pickup
-            Stop.objects.create(
-                route=route,
+            route.add_stop(
                 stop_type="pickup",
                 location=Point(
                     trip.pickup_location.x, trip.pickup_location.y, srid=4326
@@ -202,8 +202,7 @@ class FuelStop:
             )
 
             # stop for station
-            Stop.objects.create(
-                route=route,
+            route.add_stop(
                 stop_type="fuel",
                 location=Point(
                     fuel_stop["geometry"]["coordinates"][0],
@@ -241,8 +240,7 @@ class FuelStop:
                     temp_pickup_duration = (
                         temp_pickup_route["duration"] / SECONDS_IN_HOURS
                     )
-                    Stop.objects.create(
-                        route=route,
+                    route.add_stop(
                         stop_type="pickup",
                         location=Point(
                             trip.pickup_location.x, trip.pickup_location.y, srid=4326
@@ -283,8 +281,7 @@ class FuelStop:
                 coords_list.append((trip.dropoff_location.x, trip.dropoff_location.y))
 
                 # add dropoff location
-                Stop.objects.create(
-                    route=route,
+                route.add_stop(
                     stop_type="dropoff",
                     location=Point(
                         trip.dropoff_location.x, trip.dropoff_location.y, srid=4326
@@ -313,10 +310,11 @@ class FuelStop:
         final_duration = final_route["duration"] / SECONDS_IN_HOURS
 
         route.geometry = LineString(polyline.decode(final_geometry, 5))
-        route.save()
         trip.total_duration = total_duration
         trip.total_distance = total_distance_travelled
-        trip.save()
+        if not route.is_planned_in_memory:
+            route.save(touch=False)
+            trip.save()
 
         general_logger.info(
             "Final trip details: "
@@ -0,0 +1,262 @@
+from datetime import datetime, time, timedelta
+from itertools import groupby
+
+import numpy as np
+from api_v1.lib.logger import general_logger
+from api_v1.models import DutyStatus
+
+MINUTES_PER_DAY = 24 * 60
+
+# status codes of the per-minute status arrays
+OFF_DUTY, SLEEPER, DRIVING, ON_DUTY = range(4)
+STATUS_CODES = {
+    "off-duty": OFF_DUTY,
+    "sleeper": SLEEPER,
+    "driving": DRIVING,
+    "on-duty": ON_DUTY,
+}
+
+# hours of service limits for property-carrying drivers, in minutes
+MAX_DRIVING_MINUTES = 11 * 60
+MAX_WINDOW_MINUTES = 14 * 60
+MAX_DRIVING_WITHOUT_BREAK_MINUTES = 8 * 60
+MIN_BREAK_MINUTES = 30
+SHIFT_RESET_MINUTES = 10 * 60
+CYCLE_LIMIT_MINUTES = 70 * 60
+CYCLE_WINDOW_MINUTES = 8 * MINUTES_PER_DAY
+CYCLE_RESTART_MINUTES = 34 * 60
+
+RULES = ("driving_11_hour", "window_14_hour", "break_30_minute", "cycle_70_hour")
+
+
+def to_minutes(value):
+    """converts a time of day into minutes since midnight, rounded to the minute."""
+    if value == time.max:
+        return MINUTES_PER_DAY
+    return round(value.hour * 60 + value.minute + value.second / 60)
+
+
+def find_runs(mask):
+    """
+    finds the runs of consecutive True values in a boolean array.
+
+    returns:
+        a tuple of the start indexes and the (exclusive) end indexes of the runs.
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def last_reset(mask, min_minutes):
+    """
+    finds, for every minute, where the latest qualifying reset ended.
+
+    a reset is a run of at least min_minutes minutes where mask is True. minutes
+    before any reset map to 0.
+
+    returns:
+        an array holding, for every minute, the index following the latest reset
+        that ended at or before it.
+    """
+    starts, ends = find_runs(mask)
+    resets = ends[ends - starts >= min_minutes]
+    marks = np.zeros(len(mask) + 1, dtype=np.int64)
+    marks[resets] = resets
+    return np.maximum.accumulate(marks)[: len(mask)]
+
+
+def sum_since(cumulative, since):
+    """
+    returns, for every minute, the sum of a series from index since up to and
+    including that minute, given the series' cumulative sums (with a leading 0).
+    """
+    return cumulative[1:] - cumulative[since]
+
+
+class HOSAudit:
+    """
+    Audits stored duty statuses against the hours of service rules.
+
+    Duty statuses are streamed from the database one trip at a time and laid out
+    as a per-minute status array. Every rule is then evaluated for all minutes at
+    once with cumulative sums and rolling windows, so the cost per trip does not
+    depend on how many duty status rows it has.
+    """
+
+    def __init__(self, chunk_size=2000):
+        self.chunk_size = chunk_size
+
+    def get_duty_statuses(self, trip_ids=None, start_date=None, end_date=None):
+        """
+        returns the duty status rows to audit, ordered by trip and time.
+        """
+        duty_statuses = DutyStatus.objects.all()
+        if trip_ids:
+            duty_statuses = duty_statuses.filter(daily_log__trip_id__in=trip_ids)
+        if start_date:
+            duty_statuses = duty_statuses.filter(daily_log__date__gte=start_date)
+        if end_date:
+            duty_statuses = duty_statuses.filter(daily_log__date__lte=end_date)
+
+        return duty_statuses.order_by(
+            "daily_log__trip_id", "daily_log__date", "start_time"
+        ).values_list(
+            "daily_log__trip_id",
+            "daily_log__trip__current_cycle_hours",
+            "daily_log__date",
+            "start_time",
+            "end_time",
+            "status",
+        )
+
+    def iter_audits(self, trip_ids=None, start_date=None, end_date=None):
+        """
+        audits the duty statuses of every matching trip.
+
+        args:
+            trip_ids: only audit these trips.
+            start_date: only audit daily logs from this date on.
+            end_date: only audit daily logs up to this date.
+
+        yields:
+            a dictionary with the trip id, the audited hours and the violations of
+            each trip.
+        """
+        rows = self.get_duty_statuses(trip_ids, start_date, end_date).iterator(
+            chunk_size=self.chunk_size
+        )
+        for trip_id, trip_rows in groupby(rows, key=lambda row: row[0]):
+            yield self.audit_trip(trip_id, list(trip_rows))
+
+    def load_columns(self, rows):
+        """
+        converts a trip's duty status rows into columnar arrays.
+
+        returns:
+            a tuple of the first date, and the start minutes, end minutes and status
+            codes of the duty statuses, where minutes count from midnight of the
+            first date.
+        """
+        first_date = rows[0][2]
+        day_offsets = np.array(
+            [(row[2] - first_date).days * MINUTES_PER_DAY for row in rows],
+            dtype=np.int64,
+        )
+        starts = day_offsets + np.array([to_minutes(row[3]) for row in rows])
+        ends = day_offsets + np.array([to_minutes(row[4]) for row in rows])
+        statuses = np.array([STATUS_CODES[row[5]] for row in rows], dtype=np.int8)
+        return first_date, starts, ends, statuses
+
+    def build_minute_statuses(self, starts, ends, statuses):
+        """
+        expands duty statuses into one status code per minute. minutes not covered
+        by any duty status count as off duty.
+        """
+        minutes = np.arange(ends.max())
+        index = np.searchsorted(starts, minutes, side="right") - 1
+        covered = (index >= 0) & (minutes < ends[np.maximum(index, 0)])
+        return np.where(covered, statuses[np.maximum(index, 0)], OFF_DUTY)
+
+    def audit_trip(self, trip_id, rows):
+        """
+        evaluates the hours of service rules over a trip's duty statuses.
+
+        args:
+            trip_id: the id of the trip.
+            rows: the trip's duty status rows, as returned by get_duty_statuses.
+
+        returns:
+            a dictionary describing the audit of the trip.
+        """
+        first_date, starts, ends, statuses = self.load_columns(rows)
+        minute_statuses = self.build_minute_statuses(starts, ends, statuses)
+        prior_cycle_minutes = round(rows[0][1] * 60)
+
+        driving = minute_statuses == DRIVING
+        on_duty = driving | (minute_statuses == ON_DUTY)
+        driving_sums = np.concatenate(([0], np.cumsum(driving)))
+        on_duty_sums = np.concatenate(([0], np.cumsum(on_duty)))
+        minutes = np.arange(len(minute_statuses))
+
+        # a shift starts after 10 consecutive hours off duty or in the sleeper berth
+        shift_start = last_reset(~on_duty, SHIFT_RESET_MINUTES)
+        shift_driving = sum_since(driving_sums, shift_start)
+
+        # the 14 hour window opens with the first on duty minute of the shift
+        on_duty_index = np.where(on_duty, minutes, len(minutes))
+        next_on_duty = np.minimum.accumulate(on_duty_index[::-1])[::-1]
+        window_elapsed = minutes + 1 - next_on_duty[shift_start]
+
+        # driving since the last break of at least 30 minutes
+        break_end = last_reset(~driving, MIN_BREAK_MINUTES)
+        driving_since_break = sum_since(driving_sums, break_end)
+
+        # on duty time of the last 8 days, or since the last 34 hour restart
+        restart_end = last_reset(~on_duty, CYCLE_RESTART_MINUTES)
+        window_start = minutes + 1 - CYCLE_WINDOW_MINUTES
+        cycle_start = np.maximum(window_start, restart_end)
+        # the trip's prior cycle hours are taken as spread evenly over the 7 days
+        # before it, and leave the 8 day window along with those days
+        prior_window_minutes = CYCLE_WINDOW_MINUTES - MINUTES_PER_DAY
+        prior_minutes = (
+            np.clip(-window_start, 0, prior_window_minutes)
+            * prior_cycle_minutes
+            / prior_window_minutes
+        )
+        cycle_minutes = sum_since(on_duty_sums, cycle_start) + np.where(
+            restart_end == 0, prior_minutes, 0
+        )
+
+        exceeded = {
+            "driving_11_hour": driving & (shift_driving > MAX_DRIVING_MINUTES),
+            "window_14_hour": driving & (window_elapsed > MAX_WINDOW_MINUTES),
+            "break_30_minute": driving
+            & (driving_since_break > MAX_DRIVING_WITHOUT_BREAK_MINUTES),
+            "cycle_70_hour": driving & (cycle_minutes > CYCLE_LIMIT_MINUTES),
+        }
+
+        midnight = datetime.combine(first_date, time.min)
+        violations = []
+        for rule in RULES:
+            for start, end in zip(*find_runs(exceeded[rule])):
+                violations.append(
+                    {
+                        "rule": rule,
+                        "start": midnight + timedelta(minutes=int(start)),
+                        "end": midnight + timedelta(minutes=int(end)),
+                        "hours": round(int(end - start) / 60, 2),
+                    }
+                )
+        violations.sort(key=lambda violation: violation["start"])
+
+        if violations:
+            general_logger.info(
+                f"HOS audit found {len(violations)} violations for trip: {trip_id}"
+            )
+        return {
+            "trip_id": trip_id,
+            "driving_hours": round(int(driving_sums[-1]) / 60, 2),
+            "on_duty_hours": round(int(on_duty_sums[-1]) / 60, 2),
+            "violations": violations,
+        }
+
+    def summarize(self, audits):
+        """
+        builds a compliance report out of trip audits.
+
+        returns:
+            a dictionary with the number of audited trips, the number of violations
+            per rule, and the audits of the trips that have violations.
+        """
+        report = {
+            "trips_audited": 0,
+            "violation_counts": {rule: 0 for rule in RULES},
+            "trips": [],
+        }
+        for audit in audits:
+            report["trips_audited"] += 1
+            for violation in audit["violations"]:
+                report["violation_counts"][violation["rule"]] += 1
+            if audit["violations"]:
+                report["trips"].append(audit)
+        return report
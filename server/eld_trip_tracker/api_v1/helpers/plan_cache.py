@@ -0,0 +1,133 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from api_v1.lib.logger import general_logger
+from api_v1.models import Route, Stop, Trip
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+
+class PlanCache:
+    """
+    Reuses computed plans for identical or near-identical trip requests.
+
+    Requests are normalized (coordinates snapped to a grid, cycle hours bucketed)
+    and hashed into a plan key stored on the trip. A new trip whose plan key
+    matches a recently planned trip gets a copy of that trip's route and stops
+    instead of going through Mapbox again.
+    """
+
+    def normalize(self, validated_data):
+        """
+        normalizes validated trip input so that near-identical requests compare equal.
+
+        args:
+            validated_data: the validated data of a TripSerializer.
+
+        returns:
+            a dictionary of snapped coordinates and bucketed cycle hours.
+        """
+        grid = settings.PLAN_CACHE_GRID_DEGREES
+        bucket = settings.PLAN_CACHE_CYCLE_BUCKET_HOURS
+
+        def snap(point):
+            return [
+                round(round(point.x / grid) * grid, 6),
+                round(round(point.y / grid) * grid, 6),
+            ]
+
+        return {
+            "current_location": snap(validated_data["current_location"]["point"]),
+            "pickup_location": snap(validated_data["pickup_location"]["point"]),
+            "dropoff_location": snap(validated_data["dropoff_location"]["point"]),
+            "current_cycle_hours": round(
+                round(validated_data["current_cycle_hours"] / bucket) * bucket, 2
+            ),
+        }
+
+    def get_plan_key(self, validated_data):
+        """
+        returns the content hash of the normalized trip input.
+        """
+        normalized = self.normalize(validated_data)
+        return hashlib.sha256(
+            json.dumps(normalized, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def find_source_trip(self, trip):
+        """
+        finds the most recent fully planned trip sharing the trip's plan key.
+
+        args:
+            trip: the trip object.
+
+        returns:
+            the matching trip, or None if there is no usable cached plan.
+        """
+        if not trip.plan_key:
+            return None
+
+        cutoff = timezone.now() - timedelta(hours=settings.PLAN_CACHE_TTL_HOURS)
+        return (
+            Trip.objects.filter(
+                plan_key=trip.plan_key,
+                created_at__gte=cutoff,
+                total_duration__isnull=False,
+                daily_logs__isnull=False,
+            )
+            .exclude(pk=trip.pk)
+            .distinct()
+            .order_by("-created_at")
+            .first()
+        )
+
+    def materialize(self, trip, persist=True):
+        """
+        copies the route and stops of a cached plan onto the trip.
+
+        stop timestamps are shifted by the difference between the two trips'
+        creation times so that the copied plan starts when the new trip does.
+
+        args:
+            trip: the newly created trip object.
+            persist: whether to write the copied route and stops to the database.
+                when False, the returned route is unsaved and holds its stops in
+                memory.
+
+        returns:
+            the route of the trip if a cached plan was materialized, None otherwise.
+        """
+        source_trip = self.find_source_trip(trip)
+        if not source_trip:
+            general_logger.info(f"Plan cache miss for key: {trip.plan_key}")
+            return None
+
+        source_route = Route.objects.filter(trip=source_trip).first()
+        if not source_route:
+            return None
+
+        offset = trip.created_at - source_trip.created_at
+        route = Route(trip=trip, geometry=source_route.geometry)
+        for stop in source_route.stops.all():
+            route.add_stop(
+                stop_type=stop.stop_type,
+                location=stop.location,
+                duration=stop.duration,
+                timestamp=stop.timestamp + offset,
+            )
+        trip.total_distance = source_trip.total_distance
+        trip.total_duration = source_trip.total_duration
+
+        if persist:
+            with transaction.atomic():
+                # saving the trip bumps its updated_at, a single touch for the plan
+                route.save(touch=False)
+                Stop.objects.bulk_create(route.planned_stops)
+                trip.save()
+
+        general_logger.info(
+            f"Plan cache hit for key: {trip.plan_key}, copied from trip: {source_trip.id}"
+        )
+        return route
@@ -0,0 +1,230 @@
+import contextlib
+import threading
+import uuid
+from datetime import timedelta
+
+from api_v1.helpers.plan_cache import PlanCache
+from api_v1.helpers.trip_calculator import PLAN_STAGES, TripCalculator
+from api_v1.lib.logger import general_logger
+from api_v1.models import PlanningJob
+from api_v1.serializers import TripSerializer
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# stages reported on a planning job, in the order they complete
+JOB_STAGES = ("trip_created",) + PLAN_STAGES + ("daily_logs",)
+
+
+def get_job_progress(job):
+    """
+    returns the fraction of stages the job has completed, between 0 and 1.
+    """
+    if job.status == "succeeded":
+        return 1.0
+    if job.stage not in JOB_STAGES:
+        return 0.0
+    return round((JOB_STAGES.index(job.stage) + 1) / len(JOB_STAGES), 2)
+
+
+class JobReclaimed(Exception):
+    """Raised when another worker has claimed the job a worker is running."""
+
+
+class PlanningJobRunner:
+    """
+    Claims queued planning jobs from the database and plans their trips.
+
+    A running job's heartbeat is refreshed while it is planned. A job whose
+    heartbeat stops, because its worker went away, is claimed again by another
+    worker under a new claim token, and the first worker, if it is only slow,
+    can no longer record anything on the job.
+
+    Every write to the job's trip happens in a transaction that first locks the
+    job row and checks the worker's claim token (see claimed). A worker that
+    lost its claim therefore stops before writing again, and a job is never
+    reclaimed while its worker is writing, so the new worker can delete the trip
+    of the previous attempt without racing it.
+    """
+
+    def __init__(self):
+        self.plan_cache = PlanCache()
+        self.trip_calculator = TripCalculator()
+
+    def claim_next_job(self):
+        """
+        claims the oldest queued job, or a running job whose heartbeat stopped.
+
+        rows are locked with SKIP LOCKED so that concurrent workers never
+        claim the same job.
+
+        returns:
+            the claimed job, or None if there is nothing to do.
+        """
+        stale_before = timezone.now() - timedelta(
+            minutes=settings.PLANNING_JOB_TIMEOUT_MINUTES
+        )
+        with transaction.atomic():
+            job = (
+                PlanningJob.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status="queued")
+                    | Q(status="running", heartbeat_at__lt=stale_before)
+                    # jobs claimed before heartbeats were recorded
+                    | Q(
+                        status="running",
+                        heartbeat_at__isnull=True,
+                        started_at__lt=stale_before,
+                    )
+                )
+                .order_by("created_at")
+                .first()
+            )
+            if not job:
+                return None
+
+            if job.attempts >= settings.PLANNING_JOB_MAX_ATTEMPTS:
+                self.finish(job, "failed", error="Job timed out too many times")
+                return None
+
+            job.status = "running"
+            job.attempts += 1
+            job.claim_token = uuid.uuid4()
+            job.started_at = job.heartbeat_at = timezone.now()
+            job.save(
+                update_fields=[
+                    "status",
+                    "attempts",
+                    "claim_token",
+                    "started_at",
+                    "heartbeat_at",
+                    "updated_at",
+                ]
+            )
+
+        general_logger.info(f"Claimed planning job: {job.id}")
+        return job
+
+    def run(self, job):
+        """
+        plans the trip described by the job's payload, recording progress on the job.
+        """
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self.beat, args=(job, stop_heartbeat), daemon=True
+        )
+        heartbeat.start()
+        trip = None
+        try:
+            serializer = TripSerializer(data=job.payload)
+            if not serializer.is_valid():
+                self.finish(job, "failed", error=str(serializer.errors))
+                return
+
+            with self.claimed(job):
+                if job.trip_id:
+                    # a previous attempt stopped half way, start over with a fresh
+                    # trip. its worker cannot be writing to it: that takes the lock
+                    # held here, and a valid claim
+                    job.trip.delete()
+
+                trip = serializer.save(
+                    plan_key=self.plan_cache.get_plan_key(serializer.validated_data)
+                )
+                job.trip = trip
+                self.update_stage(job, "trip_created")
+
+            with self.claimed(job):
+                materialized = self.plan_cache.materialize(trip)
+            if not materialized:
+                stages = self.trip_calculator.iter_plan_stages(trip)
+                while True:
+                    # each stage writes its part of the plan as it runs
+                    with self.claimed(job):
+                        stage, _ = next(stages, (None, None))
+                        if stage is None:
+                            break
+                        self.update_stage(job, stage)
+
+            with self.claimed(job):
+                trip.create_daily_logs()
+                self.update_stage(job, "daily_logs")
+
+            self.finish(job, "succeeded")
+        except JobReclaimed:
+            general_logger.warning(
+                f"Planning job {job.id} was claimed by another worker, dropping it"
+            )
+            # the other worker plans the job with a trip of its own
+            if trip:
+                trip.delete()
+        except Exception as e:
+            general_logger.error(f"Planning job {job.id} failed: {e}")
+            try:
+                self.finish(job, "failed", error=str(e))
+            except JobReclaimed:
+                pass
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+
+    def beat(self, job, stop):
+        """
+        refreshes the heartbeat of the job until stop is set or the job is
+        claimed by another worker. runs on a thread of its own.
+        """
+        interval = settings.PLANNING_JOB_TIMEOUT_MINUTES * 60 / 3
+        try:
+            while not stop.wait(interval):
+                if not PlanningJob.objects.filter(
+                    pk=job.pk, claim_token=job.claim_token
+                ).update(heartbeat_at=timezone.now()):
+                    return
+        finally:
+            # the thread opened a database connection of its own
+            connection.close()
+
+    @contextlib.contextmanager
+    def claimed(self, job):
+        """
+        runs writes in a transaction holding the lock on the job row, as long as
+        the worker still holds its claim. claim_next_job skips locked rows, so the
+        job cannot be claimed by another worker until the writes are committed.
+
+        raises:
+            JobReclaimed: if another worker has claimed the job since.
+        """
+        with transaction.atomic():
+            if not list(
+                PlanningJob.objects.select_for_update()
+                .filter(pk=job.pk, claim_token=job.claim_token)
+                .values_list("pk", flat=True)
+            ):
+                raise JobReclaimed(job.id)
+            yield
+
+    def save_claimed(self, job, fields):
+        """
+        saves fields of the job, as long as the worker still holds its claim.
+
+        raises:
+            JobReclaimed: if another worker has claimed the job since.
+        """
+        values = {field: getattr(job, field) for field in fields}
+        if not PlanningJob.objects.filter(
+            pk=job.pk, claim_token=job.claim_token
+        ).update(**values, updated_at=timezone.now()):
+            raise JobReclaimed(job.id)
+
+    def update_stage(self, job, stage):
+        job.stage = stage
+        self.save_claimed(job, ["stage", "trip"])
+        general_logger.info(f"Planning job {job.id} completed stage: {stage}")
+
+    def finish(self, job, status, error=""):
+        job.status = status
+        job.error = error
+        job.finished_at = timezone.now()
+        self.save_claimed(job, ["status", "error", "finished_at"])
+        general_logger.info(f"Planning job {job.id} finished with status: {status}")
@@ -0,0 +1,171 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+from api_v1.lib.logger import general_logger
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+# temporary files older than this are left over by writers that crashed
+TMP_FILE_MAX_AGE_SECONDS = 60 * 60
+
+
+class RenderCache:
+    """
+    Stores rendered ELD log files on local disk under a hash of their content.
+
+    Files are looked up by a content key, so a daily log whose content has not
+    changed is never rendered twice. The cache is bounded in size: when it grows
+    past its limit, the least recently used files are evicted. Reading a file
+    bumps its modification time, which is what recency is tracked with.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or settings.ELD_RENDER_CACHE_DIR
+        self.max_bytes = (
+            settings.ELD_RENDER_CACHE_MAX_MB * 1024 * 1024
+            if max_bytes is None
+            else max_bytes
+        )
+        self._lock = threading.Lock()
+        # estimated size of the cache, None until the directory has been scanned
+        self._size = None
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get_key(self, content):
+        """
+        returns the content hash of anything JSON-serializable.
+        """
+        return hashlib.sha256(
+            json.dumps(content, sort_keys=True, cls=JSONEncoder).encode("utf-8")
+        ).hexdigest()
+
+    def get_path(self, key, extension):
+        return os.path.join(self.directory, key[:2], f"{key}.{extension}")
+
+    def get(self, key, extension):
+        """
+        returns the cached file content, or None on a miss.
+        """
+        f = self.open(key, extension)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def open(self, key, extension):
+        """
+        returns the cached file opened for binary reading, or None on a miss.
+
+        an open file stays readable if it is evicted in the meantime.
+        """
+        if not self.enabled:
+            return None
+
+        path = self.get_path(key, extension)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted since it was opened, the open file is still readable
+            pass
+        return f
+
+    def put(self, key, extension, content):
+        """
+        stores file content in the cache, evicting old files if the cache is full.
+        """
+        self.put_file(key, extension, BytesIO(content))
+
+    def put_file(self, key, extension, source):
+        """
+        stores the rest of a binary file object in the cache, without reading it
+        into memory at once.
+        """
+        if not self.enabled:
+            return
+
+        path = self.get_path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so that readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(source, f)
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except FileNotFoundError:
+            # the directory or the temporary file was removed underneath us, by
+            # an eviction in another process; the file is simply not cached
+            general_logger.warning(f"Could not cache rendered file: {path}")
+            return
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+        # the directory is only scanned once the estimate says the cache is full;
+        # files added by other processes are picked up by that scan
+        if self._size is None or self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        removes the least recently used files until the cache fits in max_bytes.
+        """
+        with self._lock:
+            files = []
+            total = 0
+            now = time.time()
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    if name.endswith(".tmp"):
+                        # files still being written by other processes are left
+                        # alone, only the leftovers of crashed writers are removed
+                        if stat.st_mtime < now - TMP_FILE_MAX_AGE_SECONDS:
+                            with contextlib.suppress(FileNotFoundError):
+                                os.remove(path)
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            if total <= self.max_bytes:
+                self._size = total
+                return
+
+            files.sort()
+            evicted = 0
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            self._size = total
+            general_logger.info(f"Evicted {evicted} files from the render cache")
+
+
+render_cache = RenderCache()
@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from api_v1.lib.logger import general_logger
+from django.conf import settings
+
+_lock = threading.Lock()
+_executor = None
+_pid = None
+
+
+def init_worker(background_image):
+    """
+    sets up each render process: Django, then the log sheet assets, so that the
+    first render of a process does not pay for loading them.
+    """
+    import django
+
+    django.setup()
+
+    from api_v1.helpers.eld_logs import (
+        RASTER_DPI,
+        get_pdf_template,
+        load_raster_template,
+    )
+
+    get_pdf_template(background_image)
+    load_raster_template(background_image, RASTER_DPI / 72)
+    general_logger.info(f"ELD render worker started: {os.getpid()}")
+
+
+def render_day(background_image, daily_data, include_pdf):
+    """renders the ELD log of a day inside a render process."""
+    from api_v1.helpers.eld_logs import ELDLog
+
+    return ELDLog().render_cached_eld_log(background_image, daily_data, include_pdf)
+
+
+def get_executor(background_image):
+    """
+    returns the render process pool of this process, starting it on first use.
+    """
+    global _executor, _pid
+
+    with _lock:
+        # a forked process does not inherit the parent's pool
+        if _executor is None or _pid != os.getpid():
+            # spawned rather than forked, web processes run threads
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.ELD_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(background_image,),
+            )
+            _pid = os.getpid()
+        return _executor
+
+
+def reset_executor():
+    global _executor
+
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def submit_render(background_image, daily_data, include_pdf):
+    """
+    renders the ELD log of a day on the render process pool.
+
+    with ELD_RENDER_WORKERS below 2, or if the pool cannot take work, the log is
+    rendered in the calling thread instead.
+
+    returns:
+        a future resolving to the PDF and PNG file contents of the log.
+    """
+    if settings.ELD_RENDER_WORKERS > 1:
+        try:
+            return get_executor(background_image).submit(
+                render_day, background_image, daily_data, include_pdf
+            )
+        except (BrokenProcessPool, RuntimeError) as e:
+            general_logger.warning(f"ELD render pool unavailable, restarting it: {e}")
+            reset_executor()
+
+    future = Future()
+    try:
+        future.set_result(render_day(background_image, daily_data, include_pdf))
+    except Exception as e:
+        future.set_exception(e)
+    return future
@@ -1,5 +1,6 @@
 from datetime import timedelta
 
+import polyline
 from api_v1.helpers.distance import Distance
 from api_v1.helpers.fuel_stops import (
     METER_TO_MILES_DIVISION,
@@ -8,25 +9,81 @@ from api_v1.helpers.fuel_stops import (
 )
 from api_v1.lib.logger import general_logger
 from api_v1.lib.mapbox import MapBoxAPI
-from api_v1.models import Stop
+from api_v1.models import Route, Stop
+from django.contrib.gis.geos import LineString
 from django.utils import timezone
 
+PLAN_STAGES = ("initial_route", "fuel_stops", "rest_stops", "durations")
+
 
 class TripCalculator:
     """
     This class provides methods to calculate routes, fuel stops, and rest stops for a trip.
     """
 
-    def __init__(self, **kwargs):
+    def __init__(self, mapbox_api=None, **kwargs):
         """
         Initializes the TripCalculator with necessary helper classes.
+
+        args:
+            mapbox_api: An optional MapBoxAPI instance shared by all helpers.
         """
         super().__init__(**kwargs)
         self.distance = Distance()
-        self.fuel_stop = FuelStop()
-        self.mapbox_api = MapBoxAPI()
+        self.mapbox_api = mapbox_api or MapBoxAPI()
+        self.fuel_stop = FuelStop(mapbox_api=self.mapbox_api)
         general_logger.info("TripCalculator initialized.")
 
+    def plan_trip(self, trip, persist=True):
+        """
+        Runs the full planning pipeline for a trip: initial route, fuel stops,
+        rest stops and stop durations.
+
+        args:
+            trip: The trip object to plan.
+            persist: Whether to write the route and stops to the database as they
+                are planned. When False, the returned route is unsaved and holds its
+                stops in memory.
+
+        returns:
+            The route of the trip.
+        """
+        route = None
+        for _, route in self.iter_plan_stages(trip, persist=persist):
+            pass
+        return route
+
+    def iter_plan_stages(self, trip, persist=True):
+        """
+        Runs the planning pipeline one stage at a time.
+
+        args:
+            trip: The trip object to plan.
+            persist: Whether to write the route and stops to the database.
+
+        yields:
+            A (stage, route) tuple after each stage completes, where stage is one of
+            PLAN_STAGES.
+        """
+        route_data = self.calculate_initial_route(trip)
+        route = Route(
+            trip=trip,
+            geometry=LineString(polyline.decode(route_data["geometry"], 5)),
+        )
+        if persist:
+            # the trip is saved when its durations are, once the plan is complete
+            route.save(touch=False)
+        yield "initial_route", route
+
+        trip, route, _, _, _ = self.calculate_fuel_stops(trip, route, route_data)
+        yield "fuel_stops", route
+
+        trip = self.calculate_rest_stops(trip, route)
+        yield "rest_stops", route
+
+        trip = self.update_durations_from_stops(trip, route)
+        yield "durations", route
+
     def calculate_initial_route(self, trip):
         """
         Gets route details from Mapbox Directions API.
@@ -127,8 +184,7 @@ class TripCalculator:
                 )
                 if point_to_interpolate not in added_locations:
                     timezone_now = timezone_now + timedelta(hours=break_position_hours)
-                    Stop.objects.create(
-                        route=route,
+                    route.add_stop(
                         stop_type="rest_break",
                         location=point_to_interpolate,
                         duration=0.5,
@@ -149,7 +205,8 @@ class TripCalculator:
                 # reset accumulated driving time after restart
                 accumulated_driving = 0
                 trip.current_cycle_hours = 0  # reset cycle after restart
-                trip.save()
+                if not route.is_planned_in_memory:
+                    trip.save()
                 general_logger.info("70-hour limit reached. Mandatory rest added.")
 
                 # continue trip after restart
@@ -173,8 +230,7 @@ class TripCalculator:
         """
         general_logger.info("Adding mandatory rest stop.")
         fraction = position_hours / trip.total_duration
-        Stop.objects.create(
-            route=route,
+        route.add_stop(
             stop_type="mandatory_rest",
             location=self.distance.interpolate_point(route.geometry, fraction),
             duration=34,  # 34-hour restart
@@ -183,19 +239,20 @@ class TripCalculator:
         general_logger.info("Mandatory rest stop added successfully.")
         return trip
 
-    def update_durations_from_stops(self, trip):
+    def update_durations_from_stops(self, trip, route):
         """
         Updates the timestamp of each stop in a trip based on the duration of the preceding stop.
         Also updates the trip's total duration.
 
         args:
             trip: The trip object to update.
+            route: The route object holding the stops.
 
         returns:
             The updated trip object.
         """
         general_logger.info(f"Updating durations from stops for trip: {trip.id}")
-        stops = Stop.objects.filter(route__trip=trip).order_by("timestamp")
+        stops = route.get_ordered_stops()
 
         duration_to_add = 0
 
@@ -206,17 +263,18 @@ class TripCalculator:
             duration_to_add += stop.duration
             if ind + 1 <= len(stops) - 1:
                 next_stop = stops[ind + 1]
-                next_stop = Stop.objects.get(id=next_stop.id)
                 next_stop.timestamp = next_stop.timestamp + timedelta(
                     hours=duration_to_add
                 )
-                next_stop.save()
 
         # update the trip's total duration
         general_logger.info(f"Before updating total duration: {trip.total_duration}")
         trip.total_duration += duration_to_add
         general_logger.info(f"Updated trip total duration: {trip.total_duration}")
-        trip.save()
+        if not route.is_planned_in_memory:
+            Stop.objects.bulk_update(stops, ["timestamp"])
+            # bumps updated_at, the one touch of the trip for the whole plan
+            trip.save()
         general_logger.info(f"Durations updated successfully for trip: {trip.id}")
 
         return trip
@@ -0,0 +1,75 @@
+import hashlib
+
+from api_v1.helpers.eld_logs import RENDER_VERSION
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+# bump when the shape of trip detail responses changes, so that clients holding
+# an ETag of the old shape get the new one instead of 304 Not Modified
+RESPONSE_FORMAT_VERSION = 1
+
+
+class TripDetailCache:
+    """
+    Caches trip detail responses under the trip id and a version stamp.
+
+    The version of a trip is its updated_at, which is bumped by every write to
+    the trip, its route, stops and logs (see Trip.touch). A write therefore
+    invalidates the cached responses of the trip without deleting them: they are
+    no longer looked up and expire on their own. The same version makes the ETag
+    of a response known before it is built, so that a client revalidating an
+    unchanged trip gets 304 Not Modified for the cost of loading the trip.
+
+    Responses carry no Last-Modified: at the one second resolution of HTTP dates,
+    a write in the same second as a read would go unnoticed. Rendered ELD logs
+    are the same for the same plan, and RENDER_VERSION changes the ETag of
+    responses that embed them when their drawing changes.
+    """
+
+    @property
+    def enabled(self):
+        return settings.TRIP_DETAIL_CACHE_SECONDS > 0
+
+    def get_version(self, trip):
+        """returns the time the trip or its plan was last written."""
+        return trip.updated_at or trip.created_at
+
+    def get_variant_key(self, trip, variant):
+        """
+        returns the hash identifying one variant of a trip's detail response.
+
+        args:
+            trip: the trip object.
+            variant: the parameters the response depends on, besides the trip.
+        """
+        parts = [
+            RESPONSE_FORMAT_VERSION,
+            RENDER_VERSION,
+            trip.id,
+            self.get_version(trip).isoformat(),
+            *variant,
+        ]
+        return hashlib.sha256(
+            ":".join(str(part) for part in parts).encode("utf-8")
+        ).hexdigest()
+
+    def get_etag(self, trip, variant):
+        return quote_etag(self.get_variant_key(trip, variant))
+
+    def get(self, trip, variant):
+        """returns the cached response of the trip, or None."""
+        if not self.enabled:
+            return None
+        return cache.get(f"trip_detail:{self.get_variant_key(trip, variant)}")
+
+    def set(self, trip, variant, response):
+        if self.enabled:
+            cache.set(
+                f"trip_detail:{self.get_variant_key(trip, variant)}",
+                response,
+                settings.TRIP_DETAIL_CACHE_SECONDS,
+            )
+
+
+trip_detail_cache = TripDetailCache()
@@ -0,0 +1,334 @@
+import os
+import threading
+from datetime import date, datetime, time
+
+from api_v1.lib.logger import general_logger
+from api_v1.models import (
+    DailyLog,
+    DutyStatus,
+    PendingPlanWrite,
+    Route,
+    Stop,
+    Trip,
+)
+from django.conf import settings
+from django.contrib.gis.geos import LineString, Point
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+TRIP_PLAN_FIELDS = ("total_distance", "total_duration", "current_cycle_hours")
+
+
+class PlanWriteFailed(Exception):
+    """
+    Raised when reading a trip whose plan is pending and failed to be written.
+    """
+
+    def __init__(self, trip_id, attempts, last_error):
+        self.trip_id = trip_id
+        # whether the background thread still retries the write
+        self.retrying = attempts < settings.WRITE_BEHIND_MAX_ATTEMPTS
+        super().__init__(
+            f"The plan of trip {trip_id} could not be saved after {attempts} "
+            f"attempts: {last_error}"
+        )
+
+
+class PlanWriteBehind:
+    """
+    Persists computed plans after the response has been sent.
+
+    A plan is first stored as a single JSON row (PendingPlanWrite) so that it
+    survives a crash. A background thread then writes the route, stops, daily
+    logs and duty statuses of all pending plans in one transaction using bulk
+    inserts. Plans that fail to be written stay pending and are retried.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def serialize_plan(self, trip, route, daily_logs):
+        """
+        converts an in-memory plan into a JSON-serializable dictionary.
+
+        args:
+            trip: the trip object, holding the planned totals.
+            route: the unsaved route, holding its stops in planned_stops.
+            daily_logs: the unsaved daily logs returned by Trip.build_daily_logs.
+
+        returns:
+            a dictionary describing the plan.
+        """
+        return {
+            "trip": {field: getattr(trip, field) for field in TRIP_PLAN_FIELDS},
+            "route": {"coordinates": route.geometry.coords},
+            "stops": [
+                {
+                    "stop_type": stop.stop_type,
+                    "location": [stop.location.x, stop.location.y],
+                    "duration": stop.duration,
+                    "timestamp": stop.timestamp.isoformat(),
+                }
+                for stop in route.planned_stops
+            ],
+            "daily_logs": [
+                {
+                    "date": daily_log.date.isoformat(),
+                    "total_miles": daily_log.total_miles,
+                    "total_mileage": daily_log.total_mileage,
+                    "remarks": daily_log.remarks,
+                    "driver_signature": daily_log.driver_signature,
+                    "duty_statuses": [
+                        {
+                            "start_time": duty_status.start_time.isoformat(),
+                            "end_time": duty_status.end_time.isoformat(),
+                            "status": duty_status.status,
+                            "status_description": duty_status.status_description,
+                        }
+                        for duty_status in daily_log.planned_duty_statuses
+                    ],
+                }
+                for daily_log in daily_logs
+            ],
+        }
+
+    def deserialize_plan(self, trip, payload):
+        """
+        rebuilds the unsaved route and daily logs of a serialized plan, and sets
+        the planned totals on the trip.
+
+        returns:
+            a tuple of the unsaved route and the list of unsaved daily logs.
+        """
+        for field, value in payload["trip"].items():
+            setattr(trip, field, value)
+
+        route = Route(
+            trip=trip,
+            geometry=LineString(payload["route"]["coordinates"], srid=4326),
+        )
+        for stop in payload["stops"]:
+            route.add_stop(
+                stop_type=stop["stop_type"],
+                location=Point(*stop["location"], srid=4326),
+                duration=stop["duration"],
+                timestamp=datetime.fromisoformat(stop["timestamp"]),
+            )
+
+        daily_logs = []
+        for log in payload["daily_logs"]:
+            daily_log = DailyLog(
+                trip=trip,
+                date=date.fromisoformat(log["date"]),
+                total_miles=log["total_miles"],
+                total_mileage=log["total_mileage"],
+                remarks=log["remarks"],
+                driver_signature=log["driver_signature"],
+            )
+            for duty_status in log["duty_statuses"]:
+                daily_log.planned_duty_statuses.append(
+                    DutyStatus(
+                        daily_log=daily_log,
+                        start_time=time.fromisoformat(duty_status["start_time"]),
+                        end_time=time.fromisoformat(duty_status["end_time"]),
+                        status=duty_status["status"],
+                        status_description=duty_status["status_description"],
+                    )
+                )
+            daily_log.set_duty_hours(daily_log.planned_duty_statuses)
+            daily_logs.append(daily_log)
+
+        return route, daily_logs
+
+    def enqueue(self, trip, route, daily_logs):
+        """
+        durably queues an in-memory plan to be written by the background thread.
+        """
+        PendingPlanWrite.objects.create(
+            trip=trip, payload=self.serialize_plan(trip, route, daily_logs)
+        )
+        general_logger.info(f"Queued plan write for trip: {trip.id}")
+        self.start()
+        # the plan is only visible to the background thread once committed
+        transaction.on_commit(self._wakeup.set)
+
+    def flush(self, trip_ids=None, include_failed=False):
+        """
+        writes a batch of pending plans in one transaction.
+
+        when the batch fails, its plans are retried one by one so that a single
+        bad plan does not hold back the others.
+
+        args:
+            trip_ids: only write the plans of these trips. other flushers holding
+                these plans are waited for instead of skipped.
+            include_failed: also write plans that already failed
+                WRITE_BEHIND_MAX_ATTEMPTS times.
+
+        returns:
+            the number of plans written.
+        """
+        pending_writes = PendingPlanWrite.objects.select_for_update(
+            skip_locked=trip_ids is None
+        ).select_related("trip")
+        if trip_ids is not None:
+            pending_writes = pending_writes.filter(trip_id__in=trip_ids)
+        elif not include_failed:
+            pending_writes = pending_writes.filter(
+                attempts__lt=settings.WRITE_BEHIND_MAX_ATTEMPTS
+            )
+
+        batch = []
+        try:
+            with transaction.atomic():
+                batch = list(
+                    pending_writes.order_by("created_at")[
+                        : settings.WRITE_BEHIND_BATCH_SIZE
+                    ]
+                )
+                self.write(batch)
+        except Exception as e:
+            if not batch:
+                raise
+            if len(batch) == 1:
+                general_logger.error(
+                    f"Writing plan for trip {batch[0].trip_id} failed: {e}"
+                )
+                PendingPlanWrite.objects.filter(pk=batch[0].pk).update(
+                    attempts=F("attempts") + 1, last_error=str(e)
+                )
+                return 0
+            general_logger.warning(
+                f"Writing plan batch failed, retrying one by one: {e}"
+            )
+            return sum(
+                self.flush(trip_ids=[pending_write.trip_id]) for pending_write in batch
+            )
+
+        if batch:
+            general_logger.info(f"Wrote {len(batch)} pending plans")
+        return len(batch)
+
+    def flush_trips(self, trip_ids):
+        """
+        writes the pending plans of trips, if any, so that they can be read back.
+        trips without a pending plan cost a single query, however many there are.
+
+        a plan that already failed to be written is not retried here: retries
+        are left to the background thread, or to flush_plan_writes once they
+        are exhausted, so that reads of the trip do not each retry it.
+
+        returns:
+            a dictionary of PlanWriteFailed errors by trip id, for the trips whose
+            plans are pending and could not be written.
+        """
+
+        def get_pending_writes():
+            return {
+                pending_write["trip_id"]: pending_write
+                for pending_write in PendingPlanWrite.objects.filter(
+                    trip_id__in=trip_ids
+                ).values("trip_id", "attempts", "last_error")
+            }
+
+        pending_writes = get_pending_writes()
+        unattempted = [
+            trip_id
+            for trip_id, pending_write in pending_writes.items()
+            if not pending_write["attempts"]
+        ]
+        if unattempted:
+            batch_size = settings.WRITE_BEHIND_BATCH_SIZE
+            for start in range(0, len(unattempted), batch_size):
+                stop = start + batch_size
+                self.flush(trip_ids=unattempted[start:stop])
+            pending_writes = get_pending_writes()
+
+        return {
+            trip_id: PlanWriteFailed(
+                trip_id, pending_write["attempts"], pending_write["last_error"]
+            )
+            for trip_id, pending_write in pending_writes.items()
+        }
+
+    def flush_trip(self, trip_id):
+        """
+        writes the pending plan of a trip, if any, so that it can be read back.
+
+        raises:
+            PlanWriteFailed: if the plan is pending and could not be written.
+        """
+        errors = self.flush_trips([trip_id])
+        if errors:
+            raise errors.popitem()[1]
+
+    def write(self, batch):
+        """
+        bulk inserts the routes, stops, daily logs and duty statuses of a batch of
+        pending plans and removes them from the queue. must run in a transaction.
+        """
+        if not batch:
+            return
+
+        routes, stops, daily_logs, duty_statuses, trips = [], [], [], [], []
+        for pending_write in batch:
+            trip = pending_write.trip
+            route, plan_daily_logs = self.deserialize_plan(trip, pending_write.payload)
+            trip.updated_at = timezone.now()
+            trips.append(trip)
+            routes.append(route)
+            stops.extend(route.planned_stops)
+            daily_logs.extend(plan_daily_logs)
+            for daily_log in plan_daily_logs:
+                duty_statuses.extend(daily_log.planned_duty_statuses)
+
+        Route.objects.bulk_create(routes)
+        Stop.objects.bulk_create(stops)
+        DailyLog.objects.bulk_create(daily_logs)
+        DutyStatus.objects.bulk_create(duty_statuses)
+        Trip.objects.bulk_update(trips, TRIP_PLAN_FIELDS + ("updated_at",))
+        PendingPlanWrite.objects.filter(
+            pk__in=[pending_write.pk for pending_write in batch]
+        ).delete()
+
+    def start(self):
+        """
+        starts the background flush thread of this process, if not running yet.
+        """
+        with self._lock:
+            # a forked process does not inherit the parent's thread
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self.run, name="plan-write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def resume(self):
+        """
+        starts the background flush thread when write-behind is enabled, so that
+        plans left pending by a previous process are written without waiting for
+        a new plan to be queued. called when a server process starts.
+        """
+        if settings.TRIP_WRITE_BEHIND:
+            self.start()
+
+    def run(self):
+        # pending plans are flushed first, then whenever woken up or polling
+        while True:
+            try:
+                close_old_connections()
+                while self.flush():
+                    pass
+            except Exception as e:
+                general_logger.error(f"Plan write-behind flush failed: {e}")
+            self._wakeup.wait(timeout=settings.WRITE_BEHIND_FLUSH_INTERVAL_SECONDS)
+            self._wakeup.clear()
+
+
+plan_write_behind = PlanWriteBehind()
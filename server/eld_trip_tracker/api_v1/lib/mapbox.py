@@ -1,4 +1,7 @@
+import copy
 import os
+import threading
+from concurrent.futures import Future
 
 import requests
 from api_v1.lib.logger import general_logger
@@ -11,11 +14,54 @@ MAPBOX_ACCESS_TOKEN = os.getenv("MAPBOX_ACCESS_TOKEN")
 BASE_URL = "https://api.mapbox.com"
 
 
-class MapBoxAPI:
+class MapBoxRequestCache:
+    """
+    Deduplicates identical Mapbox requests made by several MapBoxAPI instances,
+    e.g. across the trips of a batch. Concurrent callers asking for the same
+    request wait for the first one instead of repeating the call.
+    """
+
     def __init__(self):
-        pass
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def get_or_fetch(self, key, fetch):
+        with self._lock:
+            future = self._futures.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._futures[key] = future
+
+        if is_owner:
+            try:
+                future.set_result(fetch())
+            except Exception as e:
+                # do not cache failures, let the next caller retry
+                with self._lock:
+                    del self._futures[key]
+                future.set_exception(e)
+        else:
+            general_logger.info(f"reusing mapbox api call: {key[0]}")
+
+        # every caller gets its own copy, callers on other threads may modify theirs
+        return copy.deepcopy(future.result())
+
+
+class MapBoxAPI:
+    def __init__(self, request_cache=None):
+        self.request_cache = request_cache
 
     def make_request(self, url, extra_params):
+        if self.request_cache is None:
+            return self._make_request(url, extra_params)
+
+        key = (url, tuple(sorted((extra_params or {}).items())))
+        return self.request_cache.get_or_fetch(
+            key, lambda: self._make_request(url, extra_params)
+        )
+
+    def _make_request(self, url, extra_params):
         general_logger.info(f"making mapbox api call: {url}")
         params = {
             "access_token": MAPBOX_ACCESS_TOKEN,
@@ -0,0 +1,94 @@
+import csv
+import json
+import sys
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import date
+
+from api_v1.helpers.hos_audit import RULES, HOSAudit
+from django.core.management.base import BaseCommand
+from rest_framework.utils.encoders import JSONEncoder
+
+VIOLATION_FIELDS = ("trip_id", "rule", "start", "end", "hours")
+
+
+class Command(BaseCommand):
+    help = (
+        "Audits stored duty statuses for 11 hour driving, 14 hour window, "
+        "30 minute break and 70 hour/8 day violations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start-date",
+            type=date.fromisoformat,
+            help="Only audit daily logs from this date on (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            help="Only audit daily logs up to this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--trip",
+            action="append",
+            dest="trip_ids",
+            type=uuid.UUID,
+            help="Only audit this trip, can be repeated",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["jsonl", "csv"],
+            default="jsonl",
+            help="Format of the violations written out",
+        )
+        parser.add_argument(
+            "--output", default="-", help="Violations file, '-' for stdout"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Duty status rows fetched from the database at a time",
+        )
+
+    def handle(self, *args, **options):
+        audit = HOSAudit(chunk_size=options["chunk_size"])
+        to_stdout = options["output"] == "-"
+        report = self.stderr if to_stdout else self.stdout
+
+        started = time.perf_counter()
+        trips = 0
+        counts = dict.fromkeys(RULES, 0)
+        with (
+            nullcontext(sys.stdout)
+            if to_stdout
+            else open(options["output"], "w", newline="")
+        ) as output:
+            writer = None
+            if options["format"] == "csv":
+                writer = csv.DictWriter(output, fieldnames=VIOLATION_FIELDS)
+                writer.writeheader()
+
+            for trip_audit in audit.iter_audits(
+                trip_ids=options["trip_ids"],
+                start_date=options["start_date"],
+                end_date=options["end_date"],
+            ):
+                trips += 1
+                for violation in trip_audit["violations"]:
+                    counts[violation["rule"]] += 1
+                    row = {"trip_id": trip_audit["trip_id"], **violation}
+                    if writer:
+                        writer.writerow(row)
+                    else:
+                        output.write(json.dumps(row, cls=JSONEncoder) + "\n")
+
+        elapsed = time.perf_counter() - started
+        report.write(
+            f"Audited {trips} trips in {elapsed:.1f}s, "
+            f"found {sum(counts.values())} violations"
+        )
+        for rule, count in counts.items():
+            report.write(f"  {rule}: {count}")
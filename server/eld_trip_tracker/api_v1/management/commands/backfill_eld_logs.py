@@ -0,0 +1,292 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime
+
+from api_v1.helpers.eld_logs import (
+    BACKGROUND_IMAGE,
+    DEFAULT_PROFILE,
+    RENDER_PROFILES,
+    ELDLog,
+)
+from api_v1.helpers.render_cache import render_cache
+from api_v1.lib.logger import general_logger
+from api_v1.models import Stop, Trip
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+
+# image profiles rendered by default, the ones linked from trip responses
+DEFAULT_RENDER_PROFILES = ("palette", "thumbnail")
+
+# per-process state of the pool workers, set up by init_worker
+worker_state = {}
+
+
+def iter_trip_chunks(trips, chunk_size, after=None):
+    """
+    yields the ids of the trips a chunk at a time, ordered by creation.
+
+    trips are paged through by (created_at, id) rather than by offset, so each
+    chunk is a single indexed query and the trips are never all in memory.
+
+    args:
+        trips: the queryset of trips to go through.
+        chunk_size: the number of trips in a chunk.
+        after: the (created_at, id) of the last trip already processed.
+
+    yields:
+        a tuple of (trip ids, (created_at, id) of the last trip of the chunk).
+    """
+    while True:
+        chunk = trips
+        if after:
+            created_at, trip_id = after
+            chunk = chunk.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=trip_id)
+            )
+        rows = list(
+            chunk.order_by("created_at", "id").values_list("id", "created_at")[
+                :chunk_size
+            ]
+        )
+        if not rows:
+            return
+        after = (rows[-1][1], rows[-1][0])
+        yield [trip_id for trip_id, _ in rows], after
+
+
+def init_worker(logs, artifacts, refresh):
+    worker_state["logs"] = logs
+    worker_state["artifacts"] = artifacts
+    worker_state["refresh"] = refresh
+    worker_state["eld_log"] = ELDLog()
+
+
+def render_trip(trip):
+    """renders the ELD log files of every day of a trip into the render cache."""
+    eld_log = worker_state["eld_log"]
+    for daily_log in trip.get_daily_logs(with_duty_statuses=True):
+        log_data = eld_log.get_log_data(trip, daily_log)
+        key = eld_log.get_render_key(BACKGROUND_IMAGE, log_data)
+        for extension, profile in worker_state["artifacts"]:
+            eld_log.open_cached_artifact(
+                BACKGROUND_IMAGE,
+                log_data,
+                extension,
+                key,
+                profile,
+                refresh=worker_state["refresh"],
+            ).close()
+
+
+def backfill_chunk(item):
+    """
+    rebuilds the daily logs and/or renders the ELD logs of a chunk of trips
+    inside a pool worker.
+
+    returns:
+        a tuple of (status counts, failures, (created_at, id) of the last trip).
+    """
+    trip_ids, last_key = item
+    counts = Counter()
+    failures = []
+
+    for trip in Trip.objects.filter(id__in=trip_ids).iterator():
+        try:
+            if worker_state["logs"]:
+                # trips that were never planned have no stops to build logs from
+                if not Stop.objects.filter(route__trip=trip).exists():
+                    counts["skipped"] += 1
+                    continue
+                trip.rebuild_daily_logs()
+            if worker_state["artifacts"]:
+                render_trip(trip)
+            counts["backfilled"] += 1
+        except Exception as e:
+            general_logger.error(f"Backfilling trip {trip.id} failed: {e}")
+            counts["failed"] += 1
+            failures.append((str(trip.id), str(e)))
+
+    return counts, failures, last_key
+
+
+def read_checkpoint(path):
+    """returns the (created_at, id) of the last backfilled trip, or None."""
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    return datetime.fromisoformat(checkpoint["created_at"]), checkpoint["id"]
+
+
+def write_checkpoint(path, last_key, counts):
+    """records the last backfilled trip, replacing the checkpoint atomically."""
+    created_at, trip_id = last_key
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {"created_at": created_at.isoformat(), "id": str(trip_id), **counts}, f
+        )
+    os.replace(tmp_path, path)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily logs and/or renders the ELD log files of stored trips "
+        "on a process pool, after a change to how logs are built or drawn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--logs",
+            action="store_true",
+            help="Rebuild the daily logs and duty statuses from the trips' stops",
+        )
+        parser.add_argument(
+            "--render",
+            action="store_true",
+            help="Render the PDF and images of every daily log into the render cache",
+        )
+        parser.add_argument(
+            "--profile",
+            action="append",
+            dest="profiles",
+            choices=list(RENDER_PROFILES),
+            help="Image profile to render, can be repeated "
+            f"(defaults to {', '.join(DEFAULT_RENDER_PROFILES)})",
+        )
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Render files again even if they are already cached",
+        )
+        parser.add_argument(
+            "--trip",
+            action="append",
+            dest="trip_ids",
+            help="Only backfill this trip, can be repeated",
+        )
+        parser.add_argument(
+            "--created-after",
+            type=date.fromisoformat,
+            help="Only backfill trips created on or after this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--created-before",
+            type=date.fromisoformat,
+            help="Only backfill trips created before this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of backfill processes",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Trips handed to a worker at a time",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording progress, an interrupted run resumes from it",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and start from the first trip",
+        )
+        parser.add_argument(
+            "--report-every",
+            type=float,
+            default=10,
+            help="Seconds between progress reports",
+        )
+
+    def handle(self, *args, **options):
+        if not (options["logs"] or options["render"]):
+            raise CommandError("Set --logs, --render or both")
+        if options["render"] and not render_cache.enabled:
+            raise CommandError("The render cache is disabled, nothing to render into")
+
+        artifacts = []
+        if options["render"]:
+            artifacts.append(("pdf", DEFAULT_PROFILE))
+            for profile in options["profiles"] or DEFAULT_RENDER_PROFILES:
+                artifacts.append((RENDER_PROFILES[profile]["format"], profile))
+
+        trips = Trip.objects.all()
+        if options["trip_ids"]:
+            trips = trips.filter(id__in=options["trip_ids"])
+        if options["created_after"]:
+            trips = trips.filter(created_at__date__gte=options["created_after"])
+        if options["created_before"]:
+            trips = trips.filter(created_at__date__lt=options["created_before"])
+
+        checkpoint = options["checkpoint"]
+        after = None
+        if checkpoint and not options["restart"]:
+            after = read_checkpoint(checkpoint)
+            if after:
+                self.stdout.write(f"Resuming after trip {after[1]} ({after[0]})")
+
+        workers = options["workers"]
+        # only a bounded number of chunks are read ahead of the results
+        in_flight = threading.BoundedSemaphore(workers * 2)
+        # set when results stop being consumed, so the pool's task feeder does
+        # not wait on the semaphore forever and closing the pool cannot hang
+        stopped = threading.Event()
+
+        def throttled(chunks):
+            for chunk in chunks:
+                while not in_flight.acquire(timeout=0.1):
+                    if stopped.is_set():
+                        return
+                yield chunk
+
+        counts = Counter()
+        # forked workers must not share the parent's database connections
+        connections.close_all()
+        started = last_report = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(
+            workers,
+            initializer=init_worker,
+            initargs=(options["logs"], artifacts, options["refresh"]),
+        ) as pool:
+            # results come back in chunk order, so the checkpoint never skips
+            # over a chunk that is still being processed
+            try:
+                for chunk_counts, failures, last_key in pool.imap(
+                    backfill_chunk,
+                    throttled(iter_trip_chunks(trips, options["chunk_size"], after)),
+                ):
+                    in_flight.release()
+                    counts.update(chunk_counts)
+                    for trip_id, error in failures:
+                        self.stderr.write(f"Failed trip {trip_id}: {error}")
+                    if checkpoint:
+                        write_checkpoint(checkpoint, last_key, counts)
+
+                    now = time.perf_counter()
+                    if now - last_report >= options["report_every"]:
+                        last_report = now
+                        self.report(counts, now - started)
+            finally:
+                stopped.set()
+
+        self.report(counts, time.perf_counter() - started)
+
+    def report(self, counts, elapsed):
+        total = sum(counts.values())
+        self.stdout.write(
+            f"Processed {total} trips in {elapsed:.1f}s "
+            f"({total / elapsed if elapsed else 0:.2f} trips/s): "
+            f"{counts['backfilled']} backfilled, {counts['skipped']} skipped, "
+            f"{counts['failed']} failed"
+        )
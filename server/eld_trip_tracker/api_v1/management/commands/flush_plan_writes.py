@@ -0,0 +1,22 @@
+from api_v1.helpers.write_behind import plan_write_behind
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Writes all computed plans still waiting in the write-behind queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--include-failed",
+            action="store_true",
+            help="Also retry plans that failed WRITE_BEHIND_MAX_ATTEMPTS times",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while written := plan_write_behind.flush(
+            include_failed=options["include_failed"]
+        ):
+            total += written
+
+        self.stdout.write(f"Wrote {total} pending plans")
@@ -0,0 +1,232 @@
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+
+from api_v1.helpers.trip_calculator import TripCalculator
+from api_v1.lib.logger import general_logger
+from api_v1.models import Stop
+from api_v1.serializers import TripSerializer
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+LOCATION_FIELDS = ("current", "pickup", "dropoff")
+
+# per-process state of the pool workers, set up by init_worker
+worker_state = {}
+
+
+def read_jsonl(path):
+    """yields (line number, raw json line) for every non-empty line."""
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                yield line_no, line
+
+
+def read_csv(path):
+    """
+    yields (line number, trip spec) for every row.
+
+    expected columns: current_location_name, current_latitude, current_longitude,
+    the same three for pickup and dropoff, and current_cycle_hours.
+    """
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            spec = {
+                f"{name}_location": {
+                    "name": row.get(f"{name}_location_name", ""),
+                    "coordinates": [
+                        row.get(f"{name}_latitude"),
+                        row.get(f"{name}_longitude"),
+                    ],
+                }
+                for name in LOCATION_FIELDS
+            }
+            spec["current_cycle_hours"] = row.get("current_cycle_hours")
+            yield reader.line_num, spec
+
+
+def init_worker(persist):
+    worker_state["persist"] = persist
+    worker_state["trip_calculator"] = TripCalculator()
+
+
+def record_timing(timings, stage, stage_started):
+    now = time.perf_counter()
+    timings[stage] = now - stage_started
+    return now
+
+
+def plan_trip_spec(item):
+    """
+    plans a single trip spec inside a pool worker.
+
+    the trip is planned in a transaction which is rolled back unless the
+    command was run with --persist.
+
+    returns:
+        a tuple of (status, result as a JSON line, per-stage timings in seconds).
+    """
+    line_no, spec = item
+    timings = {}
+
+    try:
+        if isinstance(spec, str):
+            spec = json.loads(spec)
+    except json.JSONDecodeError as e:
+        result = {"line": line_no, "status": "invalid", "errors": str(e)}
+        return "invalid", json.dumps(result), timings
+
+    serializer = TripSerializer(data=spec)
+    if not serializer.is_valid():
+        result = {"line": line_no, "status": "invalid", "errors": serializer.errors}
+        return "invalid", json.dumps(result, cls=JSONEncoder), timings
+
+    try:
+        with transaction.atomic():
+            trip = serializer.save()
+            stage_started = time.perf_counter()
+            for stage, _ in worker_state["trip_calculator"].iter_plan_stages(trip):
+                stage_started = record_timing(timings, stage, stage_started)
+
+            trip.create_daily_logs()
+            record_timing(timings, "daily_logs", stage_started)
+
+            stops = Stop.objects.filter(route__trip=trip).order_by("timestamp")
+            result = {
+                "line": line_no,
+                "status": "planned",
+                "trip": TripSerializer(trip).data,
+                "stops": [
+                    {
+                        "coordinates": [stop.location.x, stop.location.y],
+                        "timestamp": stop.timestamp,
+                        "duration": stop.duration,
+                        "stop_type": stop.stop_type,
+                    }
+                    for stop in stops
+                ],
+                "daily_logs": [
+                    {"date": daily_log.date, "total_miles": daily_log.total_miles}
+                    for daily_log in trip.daily_logs.order_by("date")
+                ],
+            }
+
+            if not worker_state["persist"]:
+                transaction.set_rollback(True)
+
+        return "planned", json.dumps(result, cls=JSONEncoder), timings
+    except Exception as e:
+        general_logger.error(f"Planning trip on line {line_no} failed: {e}")
+        result = {"line": line_no, "status": "failed", "error": str(e)}
+        return "failed", json.dumps(result), timings
+
+
+class Command(BaseCommand):
+    help = (
+        "Plans trips from a JSONL or CSV file on a process pool and streams "
+        "the results out as JSONL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="Path to a .jsonl or .csv file")
+        parser.add_argument(
+            "--format",
+            choices=["jsonl", "csv"],
+            help="Input format, defaults to the file extension",
+        )
+        parser.add_argument(
+            "--output", default="-", help="JSONL results file, '-' for stdout"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of planning processes",
+        )
+        parser.add_argument(
+            "--max-in-flight",
+            type=int,
+            help="Trips read ahead of the results, defaults to 4 per worker",
+        )
+        parser.add_argument(
+            "--persist",
+            action="store_true",
+            help="Keep the planned trips in the database",
+        )
+
+    def handle(self, *args, **options):
+        input_format = options["format"] or os.path.splitext(options["input"])[1][1:]
+        if input_format not in ("jsonl", "csv"):
+            raise CommandError("Input must be a .jsonl or .csv file, or set --format")
+
+        workers = options["workers"]
+        specs = (
+            read_csv(options["input"])
+            if input_format == "csv"
+            else read_jsonl(options["input"])
+        )
+
+        # only a bounded number of specs are read ahead of the results, so
+        # memory does not grow with the size of the input file
+        in_flight = threading.BoundedSemaphore(options["max_in_flight"] or workers * 4)
+        # set when results stop being consumed, e.g. after a task failed to run,
+        # so the pool's task feeder does not wait on the semaphore forever and
+        # closing the pool cannot hang
+        stopped = threading.Event()
+
+        def throttled(items):
+            for item in items:
+                while not in_flight.acquire(timeout=0.1):
+                    if stopped.is_set():
+                        return
+                yield item
+
+        to_stdout = options["output"] == "-"
+        report = self.stderr if to_stdout else self.stdout
+        counts = Counter()
+        stage_totals = defaultdict(float)
+        stage_counts = Counter()
+
+        # forked workers must not share the parent's database connections
+        connections.close_all()
+        started = time.perf_counter()
+        with (
+            nullcontext(sys.stdout) if to_stdout else open(options["output"], "w")
+        ) as output, multiprocessing.get_context("fork").Pool(
+            workers, initializer=init_worker, initargs=(options["persist"],)
+        ) as pool:
+            try:
+                for status, line, timings in pool.imap_unordered(
+                    plan_trip_spec, throttled(specs)
+                ):
+                    in_flight.release()
+                    output.write(line + "\n")
+                    counts[status] += 1
+                    for stage, seconds in timings.items():
+                        stage_totals[stage] += seconds
+                        stage_counts[stage] += 1
+            finally:
+                stopped.set()
+
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        report.write(
+            f"Processed {total} trips in {elapsed:.1f}s "
+            f"({total / elapsed if elapsed else 0:.2f} trips/s): "
+            f"{counts['planned']} planned, {counts['invalid']} invalid, "
+            f"{counts['failed']} failed"
+        )
+        for stage, seconds in stage_totals.items():
+            report.write(
+                f"  {stage}: {seconds / stage_counts[stage]:.3f}s avg, "
+                f"{seconds:.1f}s total"
+            )
@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import time
+
+from api_v1.helpers.planning_jobs import PlanningJobRunner
+from api_v1.lib.logger import general_logger
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def work(poll_interval):
+    """runs in each worker process: plans queued jobs until terminated."""
+    runner = PlanningJobRunner()
+    general_logger.info(f"Planning worker started: {os.getpid()}")
+    while True:
+        job = runner.claim_next_job()
+        if job:
+            runner.run(job)
+        else:
+            time.sleep(poll_interval)
+
+
+class Command(BaseCommand):
+    help = "Runs worker processes that plan trips queued with POST /trips?mode=async."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of planning processes",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling again when the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        # forked workers must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+
+        def start_worker():
+            process = context.Process(
+                target=work, args=(options["poll_interval"],), daemon=True
+            )
+            process.start()
+            return process
+
+        processes = [start_worker() for _ in range(options["workers"])]
+        self.stdout.write(f"Started {len(processes)} planning workers")
+        try:
+            while True:
+                for index, process in enumerate(processes):
+                    if not process.is_alive():
+                        general_logger.warning(
+                            f"Planning worker {process.pid} exited, restarting it"
+                        )
+                        processes[index] = start_worker()
+                time.sleep(5)
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            self.stdout.write("Stopped planning workers")
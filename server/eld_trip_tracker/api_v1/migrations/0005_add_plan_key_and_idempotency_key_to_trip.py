@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api_v1", "0004_add_location_names_to_trip"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trip",
+            name="idempotency_key",
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="trip",
+            name="plan_key",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=64
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:14
+
+from datetime import date, datetime, time, timedelta
+
+from django.db import migrations, models
+
+DUTY_HOURS_FIELDS = {
+    "off-duty": "off_duty_hours",
+    "sleeper": "sleeper_hours",
+    "driving": "driving_hours",
+    "on-duty": "on_duty_hours",
+}
+
+
+BATCH_SIZE = 500
+
+
+def backfill_duty_hours(apps, schema_editor):
+    DailyLog = apps.get_model("api_v1", "DailyLog")
+    fields = list(DUTY_HOURS_FIELDS.values())
+    # logs are read and written a batch at a time, never all in memory
+    daily_logs = DailyLog.objects.order_by("pk").prefetch_related("duty_statuses")
+    batch = []
+    for daily_log in daily_logs.iterator(chunk_size=BATCH_SIZE):
+        for duty_status in daily_log.duty_statuses.all():
+            start = datetime.combine(date.min, duty_status.start_time)
+            end = datetime.combine(date.min, duty_status.end_time)
+            if duty_status.end_time == time.max:
+                end += timedelta(microseconds=1)
+            field = DUTY_HOURS_FIELDS[duty_status.status]
+            setattr(
+                daily_log,
+                field,
+                getattr(daily_log, field) + (end - start).total_seconds() / 3600,
+            )
+        batch.append(daily_log)
+        if len(batch) == BATCH_SIZE:
+            DailyLog.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        DailyLog.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api_v1", "0007_add_pending_plan_write_model"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailylog",
+            name="driving_hours",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name="dailylog",
+            name="off_duty_hours",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name="dailylog",
+            name="on_duty_hours",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name="dailylog",
+            name="sleeper_hours",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_duty_hours, migrations.RunPython.noop),
+    ]
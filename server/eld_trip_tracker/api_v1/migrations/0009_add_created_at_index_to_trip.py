@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api_v1", "0008_add_duty_hours_to_daily_log"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["created_at", "id"], name="api_v1_trip_created_302ebf_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api_v1", "0009_add_created_at_index_to_trip"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="planningjob",
+            name="claim_token",
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="planningjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="planningjob",
+            name="idempotency_key",
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -1,7 +1,17 @@
 from .daily_log import DailyLog
 from .duty_status import DutyStatus
+from .pending_plan_write import PendingPlanWrite
+from .planning_job import PlanningJob
 from .route import Route
 from .stop import Stop
 from .trip import Trip
 
-__all__ = ["Trip", "Route", "Stop", "DailyLog", "DutyStatus"]
+__all__ = [
+    "Trip",
+    "Route",
+    "Stop",
+    "DailyLog",
+    "DutyStatus",
+    "PlanningJob",
+    "PendingPlanWrite",
+]
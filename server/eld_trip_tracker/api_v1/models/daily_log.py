@@ -1,8 +1,17 @@
 from django.db import models
+from django.utils.functional import cached_property
 
 from .base import CommonFieldsMixin
 from .trip import Trip
 
+# column holding the hours spent in each duty status
+DUTY_HOURS_FIELDS = {
+    "off-duty": "off_duty_hours",
+    "sleeper": "sleeper_hours",
+    "driving": "driving_hours",
+    "on-duty": "on_duty_hours",
+}
+
 
 class DailyLog(CommonFieldsMixin):
     trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="daily_logs")
@@ -11,9 +20,65 @@ class DailyLog(CommonFieldsMixin):
     total_mileage = models.FloatField()
     remarks = models.TextField(blank=True)
     driver_signature = models.CharField(max_length=250, null=False, unique=False)
+    off_duty_hours = models.FloatField(default=0.0)
+    sleeper_hours = models.FloatField(default=0.0)
+    driving_hours = models.FloatField(default=0.0)
+    on_duty_hours = models.FloatField(default=0.0)
 
     class Meta:
         unique_together = ["trip", "date"]
 
     def __str__(self):
         return f"Log for {self.date} - Trip {self.trip_id}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Trip.touch(self.trip_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Trip.touch(self.trip_id)
+        return result
+
+    @cached_property
+    def planned_duty_statuses(self):
+        """duty statuses of a daily log that has not been saved yet."""
+        return []
+
+    @property
+    def total_hours(self):
+        return sum(getattr(self, field) for field in DUTY_HOURS_FIELDS.values())
+
+    def get_ordered_duty_statuses(self):
+        """
+        Returns the duty statuses of the log ordered by start time.
+        """
+        if self._state.adding:
+            return sorted(self.planned_duty_statuses, key=lambda s: s.start_time)
+        # logs from Trip.get_daily_logs come with their duty statuses in order
+        if "duty_statuses" in getattr(self, "_prefetched_objects_cache", {}):
+            return list(self.duty_statuses.all())
+        return list(self.duty_statuses.order_by("start_time"))
+
+    def set_duty_hours(self, duty_statuses):
+        """
+        Sets the hours spent in each duty status from the given duty statuses,
+        without saving the log.
+        """
+        for field in DUTY_HOURS_FIELDS.values():
+            setattr(self, field, 0.0)
+        for duty_status in duty_statuses:
+            field = DUTY_HOURS_FIELDS[duty_status.status]
+            setattr(self, field, getattr(self, field) + duty_status.duration_hours)
+
+    def update_duty_hours(self):
+        """
+        Recomputes the stored duty hours of a saved log from its duty statuses.
+        """
+        from .duty_status import DutyStatus
+
+        # read afresh: the log's prefetched duty statuses may predate the write,
+        # and are dropped so that they are not read again
+        getattr(self, "_prefetched_objects_cache", {}).pop("duty_statuses", None)
+        self.set_duty_hours(DutyStatus.objects.filter(daily_log=self))
+        self.save(update_fields=[*DUTY_HOURS_FIELDS.values(), "updated_at"])
@@ -1,3 +1,5 @@
+from datetime import date, datetime, time, timedelta
+
 from django.db import models
 
 from .base import CommonFieldsMixin
@@ -21,3 +23,23 @@ class DutyStatus(CommonFieldsMixin):
 
     def __str__(self):
         return f"{self.get_status_display()} {self.start_time}-{self.end_time}"
+
+    @property
+    def duration_hours(self):
+        start = datetime.combine(date.min, self.start_time)
+        end = datetime.combine(date.min, self.end_time)
+        if self.end_time == time.max:
+            # entries running up to midnight end at the last microsecond of the day
+            end += timedelta(microseconds=1)
+        return (end - start).total_seconds() / 3600
+
+    def save(self, *args, **kwargs):
+        # keep the duty hours stored on the daily log in sync; bulk writes
+        # bypass this and are expected to set the hours themselves
+        super().save(*args, **kwargs)
+        self.daily_log.update_duty_hours()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.daily_log.update_duty_hours()
+        return result
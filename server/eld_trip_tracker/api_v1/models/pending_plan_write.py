@@ -0,0 +1,18 @@
+from django.db import models
+
+from .base import CommonFieldsMixin
+from .trip import Trip
+
+
+class PendingPlanWrite(CommonFieldsMixin):
+    """A computed plan whose route, stops and logs have not been written yet."""
+
+    trip = models.OneToOneField(
+        Trip, on_delete=models.CASCADE, related_name="pending_plan_write"
+    )
+    payload = models.JSONField()
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    def __str__(self):
+        return f"Pending plan write for Trip {self.trip_id}"
@@ -0,0 +1,39 @@
+from django.db import models
+
+from .base import CommonFieldsMixin
+from .trip import Trip
+
+
+class PlanningJob(CommonFieldsMixin):
+    STATUS_CHOICES = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    )
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="queued", db_index=True
+    )
+    stage = models.CharField(max_length=30, blank=True, default="")
+    trip = models.ForeignKey(
+        Trip,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="planning_jobs",
+    )
+    error = models.TextField(blank=True, default="")
+    attempts = models.IntegerField(default=0)
+    idempotency_key = models.CharField(
+        max_length=255, blank=True, null=True, unique=True
+    )
+    # identifies the current claim on the job, a worker whose claim was taken
+    # over by another one must not record results
+    claim_token = models.UUIDField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Planning job {self.id} ({self.status})"
@@ -1,5 +1,6 @@
 from django.contrib.gis.db import models as gis_models
 from django.db import models
+from django.utils.functional import cached_property
 
 from .base import CommonFieldsMixin
 from .trip import Trip
@@ -12,3 +13,51 @@ class Route(CommonFieldsMixin):
 
     def __str__(self):
         return f"Route for Trip {self.trip_id}"
+
+    def save(self, *args, touch=True, **kwargs):
+        """
+        Saves the route and touches its trip. Planning passes touch=False: the
+        trip is saved once the plan is complete, which bumps its updated_at.
+        """
+        super().save(*args, **kwargs)
+        if touch:
+            Trip.touch(self.trip_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Trip.touch(self.trip_id)
+        return result
+
+    @property
+    def is_planned_in_memory(self):
+        """
+        A route that has not been saved is planned without writing to the
+        database: its stops are kept in planned_stops and the trip is not saved.
+        """
+        return self._state.adding
+
+    @cached_property
+    def planned_stops(self):
+        return []
+
+    def add_stop(self, **fields):
+        """
+        Adds a stop to the route, in memory if the route has not been saved.
+        Stops are only added while planning, so their trip is not touched.
+        """
+        from .stop import Stop
+
+        stop = Stop(route=self, **fields)
+        if self.is_planned_in_memory:
+            self.planned_stops.append(stop)
+        else:
+            stop.save(touch=False)
+        return stop
+
+    def get_ordered_stops(self):
+        """
+        Returns the stops of the route ordered by timestamp.
+        """
+        if self.is_planned_in_memory:
+            return sorted(self.planned_stops, key=lambda stop: stop.timestamp)
+        return list(self.stops.order_by("timestamp"))
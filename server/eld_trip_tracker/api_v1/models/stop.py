@@ -3,6 +3,7 @@ from django.db import models
 
 from .base import CommonFieldsMixin
 from .route import Route
+from .trip import Trip
 
 
 class Stop(CommonFieldsMixin):
@@ -26,3 +27,18 @@ class Stop(CommonFieldsMixin):
             f"Duration: {self.duration}, "
             f"Location: {self.location}"
         )
+
+    def save(self, *args, touch=True, **kwargs):
+        """
+        Saves the stop and touches its trip, see Route.save.
+        """
+        super().save(*args, **kwargs)
+        if touch:
+            # stops are saved through the route they are added to, already loaded
+            Trip.touch(self.route.trip_id)
+
+    def delete(self, *args, **kwargs):
+        trip_id = self.route.trip_id
+        result = super().delete(*args, **kwargs)
+        Trip.touch(trip_id)
+        return result
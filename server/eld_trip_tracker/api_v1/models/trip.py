@@ -1,13 +1,23 @@
 from datetime import datetime, time, timedelta
 
+from api_v1.helpers.duty_timeline import coalesce_segments, split_duty_segments
 from api_v1.lib.logger import general_logger
 from django.contrib.gis.db import models as gis_models
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 from .base import CommonFieldsMixin
 
 
+def to_microseconds(delta):
+    return delta // timedelta(microseconds=1)
+
+
+def to_time(microseconds):
+    """converts microseconds since midnight into a time of day."""
+    return (datetime.min + timedelta(microseconds=microseconds)).time()
+
+
 class Trip(CommonFieldsMixin):
     current_location = gis_models.PointField(srid=4326)
     current_location_name = models.CharField(max_length=255, default="")
@@ -18,146 +28,209 @@ class Trip(CommonFieldsMixin):
     current_cycle_hours = models.FloatField()
     total_distance = models.FloatField(blank=True, null=True)
     total_duration = models.FloatField(blank=True, null=True)
+    plan_key = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    idempotency_key = models.CharField(
+        max_length=255, blank=True, null=True, unique=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # trips are paged through in creation order by backfill_eld_logs
+        indexes = [models.Index(fields=["created_at", "id"])]
+
     def __str__(self):
         return (
             f"Trip from {self.pickup_location} to {self.dropoff_location} ({self.id})"
         )
 
+    @classmethod
+    def touch(cls, trip_id):
+        """
+        Bumps the updated_at of a trip after a write to its route, stops or logs,
+        which invalidates its cached detail responses.
+        """
+        cls.objects.filter(pk=trip_id).update(updated_at=timezone.now())
+
     def create_daily_logs(self):
         """
         Creates daily logs, duty status entries, and calculates mileage for a trip.
 
         This method processes the trip's timeline, including stops and driving periods,
         to generate daily logs with corresponding duty status entries. It also calculates
-        the mileage for each day based on the driving periods.
+        the mileage for each day based on the driving periods. The logs are written
+        with a constant number of queries, whatever the length of the trip.
+
+        returns:
+            the list of created daily logs.
         """
         from .daily_log import DailyLog
         from .duty_status import DutyStatus
         from .stop import Stop
 
         stops = Stop.objects.filter(route__trip=self).order_by("timestamp")
-        current_datetime = self.created_at
-        daily_logs = {}
-        daily_mileage = {}  # track mileage per day
-
-        # create timeline events
-        timeline = []
-        for stop in stops:
-            # add driving period before stop
-            if stop.timestamp > current_datetime:
-                timeline.append(
-                    ("driving", current_datetime, stop.timestamp, stop.stop_type)
-                )
+        daily_logs = self.build_daily_logs(stops)
+        with transaction.atomic():
+            DailyLog.objects.bulk_create(daily_logs)
+            DutyStatus.objects.bulk_create(
+                [
+                    duty_status
+                    for daily_log in daily_logs
+                    for duty_status in daily_log.planned_duty_statuses
+                ]
+            )
+            # bulk inserts do not go through save, which touches the trip
+            self.touch(self.id)
+        general_logger.info(f"Created {len(daily_logs)} daily logs for trip {self.id}")
+        return daily_logs
+
+    @staticmethod
+    def get_daily_log_queryset(with_duty_statuses=False):
+        """
+        Returns the daily logs ordered by date.
 
-            # add the stop itself
-            timeline.append(
-                (
-                    stop.stop_type,
-                    stop.timestamp,
-                    stop.timestamp + timedelta(hours=stop.duration),
-                    stop.stop_type,
+        With duty statuses, the duty statuses of every log are fetched in one more
+        query, ordered by start time, so reading them costs no query per log.
+        """
+        from .daily_log import DailyLog
+        from .duty_status import DutyStatus
+
+        daily_logs = DailyLog.objects.order_by("date")
+        if with_duty_statuses:
+            daily_logs = daily_logs.prefetch_related(
+                models.Prefetch(
+                    "duty_statuses",
+                    queryset=DutyStatus.objects.order_by("start_time"),
                 )
             )
-            current_datetime = stop.timestamp + timedelta(hours=stop.duration)
+        return daily_logs
 
-        # process timeline by day
-        start_date = self.created_at.date()
-        end_date = (self.created_at + timedelta(hours=self.total_duration)).date()
+    @classmethod
+    def prefetch_plans(
+        cls, trips, stops=True, daily_logs=True, with_duty_statuses=False
+    ):
+        """
+        Fetches the stops and daily logs of many trips at once, in a fixed number
+        of queries whatever the number and length of the trips. get_stops and
+        get_daily_logs then return them without querying.
+        """
+        from .stop import Stop
 
-        for day in (
-            start_date + timedelta(n) for n in range((end_date - start_date).days + 1)
-        ):
-            daily_log, _ = DailyLog.objects.get_or_create(
-                trip=self,
-                date=day,
-                defaults={
-                    "total_miles": 0,
-                    "total_mileage": 0,
-                    "remarks": f"Auto-generated log for {day}",
-                    "driver_signature": "",
-                },
+        if stops:
+            trip_stops = {trip.id: [] for trip in trips}
+            for stop in (
+                Stop.objects.filter(route__trip__in=trip_stops)
+                .annotate(route_trip_id=models.F("route__trip_id"))
+                .order_by("timestamp")
+            ):
+                trip_stops[stop.route_trip_id].append(stop)
+            for trip in trips:
+                trip.prefetched_stops = trip_stops[trip.id]
+
+        if daily_logs:
+            models.prefetch_related_objects(
+                trips,
+                models.Prefetch(
+                    "daily_logs",
+                    queryset=cls.get_daily_log_queryset(with_duty_statuses),
+                    to_attr="prefetched_daily_logs",
+                ),
             )
-            daily_logs[day] = daily_log
-            daily_mileage[day] = 0.0
-            general_logger.info(f"Created/retrieved daily log for {day}")
-
-        # create duty status entries and calculate mileage
-        for event in timeline:
-            event_type, start, end, status_description = event
-            current_day = start.date()
-
-            while current_day <= end.date():
-                day_log = daily_logs[current_day]
-                day_start = timezone.make_aware(datetime.combine(current_day, time.min))
-                day_end = timezone.make_aware(datetime.combine(current_day, time.max))
-
-                # calculate overlap with current day
-                overlap_start = max(start, day_start)
-                overlap_end = min(end, day_end)
-
-                if overlap_start >= overlap_end:
-                    current_day += timedelta(days=1)
-                    continue
-
-                # calculate mileage for driving periods
-                if event_type == "driving":
-                    # get the fraction of the route for this driving period
-                    total_trip_duration = (
-                        self.created_at + timedelta(hours=self.total_duration)
-                    ) - self.created_at
-                    driving_duration = overlap_end - overlap_start
-                    fraction = (
-                        driving_duration.total_seconds()
-                        / total_trip_duration.total_seconds()
-                    )
-
-                    # calculate distance for this driving period
-                    driving_distance = self.total_distance * fraction
-                    daily_mileage[current_day] += driving_distance
-                    general_logger.info(
-                        f"Calculated driving distance: {driving_distance} for {current_day}"
-                    )
-
-                # determine status type
-                if event_type == "mandatory_rest":
-                    status = "off-duty"
-                elif event_type == "rest_break":
-                    status = "sleeper"
-                elif event_type in ("fuel", "pickup", "dropoff"):
-                    status = "on-duty"
-                else:  # driving
-                    status = "driving"
-
-                DutyStatus.objects.create(
-                    daily_log=day_log,
-                    start_time=overlap_start.time(),
-                    end_time=overlap_end.time(),
-                    status=status,
-                    status_description=status_description,
+            for trip in trips:
+                trip.prefetched_duty_statuses = with_duty_statuses
+
+    def get_stops(self):
+        """
+        Returns the stops of the trip ordered by timestamp.
+        """
+        from .stop import Stop
+
+        if hasattr(self, "prefetched_stops"):
+            return self.prefetched_stops
+        return list(Stop.objects.filter(route__trip=self).order_by("timestamp"))
+
+    def get_daily_logs(self, with_duty_statuses=False):
+        """
+        Returns the daily logs of the trip ordered by date, see
+        get_daily_log_queryset.
+        """
+        if hasattr(self, "prefetched_daily_logs") and (
+            self.prefetched_duty_statuses or not with_duty_statuses
+        ):
+            return self.prefetched_daily_logs
+        return list(self.get_daily_log_queryset(with_duty_statuses).filter(trip=self))
+
+    def rebuild_daily_logs(self):
+        """
+        Replaces the daily logs of the trip with logs built again from its stops,
+        for trips planned before a change to how logs are built.
+
+        returns:
+            the list of new daily logs.
+        """
+        with transaction.atomic():
+            self.daily_logs.all().delete()
+            return self.create_daily_logs()
+
+    def build_daily_logs(self, stops):
+        """
+        Builds unsaved daily logs for the trip from its stops, ordered by date.
+
+        Each daily log carries its unsaved duty status entries in
+        planned_duty_statuses, along with the hours spent in each duty status.
+        Contiguous entries with the same status are merged into one, keeping the
+        descriptions of the merged events. Days without any duty status are left out.
+
+        args:
+            stops: the stops of the trip, ordered by timestamp.
+
+        returns:
+            a list of unsaved DailyLog objects.
+        """
+        from .daily_log import DailyLog
+        from .duty_status import DutyStatus
+
+        start = timezone.localtime(self.created_at)
+        start_date = start.date()
+        midnight = timezone.make_aware(datetime.combine(start_date, time.min))
+
+        segments, daily_mileage = split_duty_segments(
+            day_offset=to_microseconds(start - midnight),
+            stop_offsets=[to_microseconds(stop.timestamp - start) for stop in stops],
+            stop_durations=[
+                to_microseconds(timedelta(hours=stop.duration)) for stop in stops
+            ],
+            stop_types=[stop.stop_type for stop in stops],
+            total_duration=to_microseconds(timedelta(hours=self.total_duration)),
+            total_distance=self.total_distance,
+        )
+
+        daily_logs = {}
+        for day, segment_start, segment_end, status, description in coalesce_segments(
+            segments
+        ):
+            if day not in daily_logs:
+                date = start_date + timedelta(days=day)
+                daily_logs[day] = DailyLog(
+                    trip=self,
+                    date=date,
+                    total_miles=daily_mileage.get(day, 0.0),
+                    total_mileage=0,
+                    remarks=f"Auto-generated log for {date}",
+                    driver_signature="",
                 )
-                general_logger.info(
-                    f"Created duty status: {status} for {current_day} "
-                    f"from {overlap_start.time()} to {overlap_end.time()}"
+
+            daily_log = daily_logs[day]
+            daily_log.planned_duty_statuses.append(
+                DutyStatus(
+                    daily_log=daily_log,
+                    start_time=to_time(segment_start),
+                    end_time=to_time(segment_end),
+                    status=status,
+                    status_description=description,
                 )
+            )
 
-                # move to next day if needed
-                if overlap_end == day_end:
-                    current_day += timedelta(days=1)
-                else:
-                    break
+        for daily_log in daily_logs.values():
+            daily_log.set_duty_hours(daily_log.planned_duty_statuses)
 
-        # update daily logs with calculated mileage
-        for day, mileage in daily_mileage.items():
-            daily_log = daily_logs[day]
-            daily_log.total_miles = mileage
-            daily_log.save()
-            general_logger.info(f"Updated daily log for {day} with mileage: {mileage}")
-
-        # delete empty daily logs
-        for day, daily_log in list(daily_logs.items()):
-            if not daily_log.duty_statuses.exists():
-                daily_log.delete()
-                del daily_logs[day]
-                general_logger.info(f"Deleted empty daily log for {day}")
+        return [daily_logs[day] for day in sorted(daily_logs)]
@@ -1,4 +1,4 @@
-from api_v1.models import Trip
+from api_v1.models import PlanningJob, Trip
 from django.contrib.gis.geos import Point
 from rest_framework import serializers
 
@@ -73,3 +73,20 @@ class TripSerializer(serializers.ModelSerializer):
             "longitude": instance.dropoff_location.x,
         }
         return representation
+
+
+class PlanningJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PlanningJob
+        fields = [
+            "id",
+            "status",
+            "stage",
+            "trip",
+            "error",
+            "attempts",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from api_v1.models import Route, Trip
+from django.contrib.gis.geos import LineString, Point
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+def create_trip(days):
+    """
+    Creates a trip planned over the given number of days, with a 10-hour rest
+    every day and a daily log for every calendar day it spans.
+    """
+    trip = Trip.objects.create(
+        current_location=Point(-73.9, 40.7, srid=4326),
+        pickup_location=Point(-75.1, 39.9, srid=4326),
+        dropoff_location=Point(-87.6, 41.8, srid=4326),
+        current_cycle_hours=0,
+        total_distance=days * 550,
+        total_duration=(days - 1) * 24 + 12,
+    )
+    route = Route.objects.create(
+        trip=trip,
+        geometry=LineString([(-73.9, 40.7), (-87.6, 41.8)], srid=4326),
+    )
+    route.add_stop(
+        stop_type="pickup",
+        location=Point(-75.1, 39.9, srid=4326),
+        duration=1,
+        timestamp=trip.created_at + timedelta(hours=1),
+    )
+    for day in range(days - 1):
+        route.add_stop(
+            stop_type="mandatory_rest",
+            location=Point(-80, 41, srid=4326),
+            duration=10,
+            timestamp=trip.created_at + timedelta(days=day, hours=12),
+        )
+    route.add_stop(
+        stop_type="dropoff",
+        location=Point(-87.6, 41.8, srid=4326),
+        duration=1,
+        timestamp=trip.created_at + timedelta(hours=trip.total_duration - 1),
+    )
+    trip.create_daily_logs()
+    return trip
+
+
+@override_settings(TRIP_DETAIL_CACHE_SECONDS=0, TRIP_WRITE_BEHIND=False)
+class TripQueryCountTests(TestCase):
+    """
+    Reading a trip costs the same number of queries whatever its length, and
+    listing trips the same whatever their number.
+    """
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries)
+
+    def test_trip_detail_queries_do_not_grow_with_trip_length(self):
+        short_trip, long_trip = create_trip(days=1), create_trip(days=10)
+        self.assertGreaterEqual(long_trip.daily_logs.count(), 10)
+
+        for query in ("", "?artifacts=vector"):
+            with self.subTest(query=query):
+                expected = self.count_queries(
+                    reverse("api_v1:trip-detail", kwargs={"pk": short_trip.id}) + query
+                )
+                with self.assertNumQueries(expected):
+                    response = self.client.get(
+                        reverse("api_v1:trip-detail", kwargs={"pk": long_trip.id})
+                        + query
+                    )
+                self.assertEqual(
+                    len(response.json()["eld_logs"]), long_trip.daily_logs.count()
+                )
+
+    def test_trip_list_queries_do_not_grow_with_trips(self):
+        url = reverse("api_v1:trip-list") + "?include=stops,eld_logs"
+        create_trip(days=1)
+        expected = self.count_queries(url)
+
+        for _ in range(4):
+            create_trip(days=10)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()["results"]), 5)
@@ -1,5 +1,16 @@
+from api_v1.views.eld_log import (
+    ELDLogArtifactAPIView,
+    LogSheetAPIView,
+    TripELDLogPDFAPIView,
+)
 from api_v1.views.health import health_check
-from api_v1.views.trip import TripDetailAPIView, TripListCreateAPIView
+from api_v1.views.hos_audit import HOSAuditAPIView
+from api_v1.views.planning_job import PlanningJobDetailAPIView
+from api_v1.views.trip import (
+    TripBatchCreateAPIView,
+    TripDetailAPIView,
+    TripListCreateAPIView,
+)
 from django.urls import path
 from rest_framework import routers
 
@@ -10,6 +21,24 @@ router = routers.SimpleRouter()
 urlpatterns = [
     path("healthz/", health_check, name="health_check"),
     path("trips", TripListCreateAPIView.as_view(), name="trip-list"),
+    path("trips/batch", TripBatchCreateAPIView.as_view(), name="trip-batch"),
     path("trips/<uuid:pk>", TripDetailAPIView.as_view(), name="trip-detail"),
+    path(
+        "trips/<uuid:pk>/eld-logs/<str:log_date>.<str:extension>",
+        ELDLogArtifactAPIView.as_view(),
+        name="trip-eld-log",
+    ),
+    path(
+        "trips/<uuid:pk>/eld-logs.pdf",
+        TripELDLogPDFAPIView.as_view(),
+        name="trip-eld-logs-pdf",
+    ),
+    path(
+        "jobs/<uuid:pk>",
+        PlanningJobDetailAPIView.as_view(),
+        name="planning-job-detail",
+    ),
+    path("hos-audit", HOSAuditAPIView.as_view(), name="hos-audit"),
+    path("eld-log-sheet.png", LogSheetAPIView.as_view(), name="eld-log-sheet"),
 ]
 urlpatterns += router.urls
@@ -0,0 +1,295 @@
+import os
+import re
+from datetime import date
+from io import BytesIO
+
+from api_v1.helpers.eld_logs import (
+    BACKGROUND_IMAGE,
+    DEFAULT_PROFILE,
+    RENDER_PROFILES,
+    ELDLog,
+)
+from api_v1.helpers.write_behind import PlanWriteFailed, plan_write_behind
+from api_v1.lib.logger import general_logger
+from api_v1.models import Trip
+from api_v1.views.trip import build_plan_write_failed_response
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "png": "image/png",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+    "json": "application/json",
+}
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+# render profile of image files requested without one
+DEFAULT_PROFILES = {"png": DEFAULT_PROFILE, "webp": "webp"}
+
+
+class FirstRendererNegotiation(BaseContentNegotiation):
+    """
+    Picks the JSON renderer for errors whatever the client accepts, so that a
+    request for an image is not refused with 406 before reaching the view.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+def get_byte_range(range_header, size):
+    """
+    parses a single byte range of a Range header.
+
+    args:
+        range_header: the value of the Range header.
+        size: the size of the content in bytes.
+
+    returns:
+        the first and last byte positions of the range, or None when the header
+        is malformed or asks for several ranges and the whole content is sent.
+
+    raises:
+        ValueError: if the range lies outside the content.
+    """
+    match = RANGE_PATTERN.match(range_header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+    if not start:
+        # a suffix range, the last bytes of the content
+        length = int(end)
+        if not length:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range starts past the end of the content")
+    end = int(end) if end else size - 1
+    return start, min(end, size - 1)
+
+
+def iter_file_range(f, start, end):
+    """
+    yields the bytes of a file from start to end included, a chunk at a time,
+    then closes the file.
+    """
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def build_artifact_response(request, f, extension, filename, key):
+    """
+    Construct the streamed response of a rendered ELD log file, honouring
+    conditional and Range requests. The file is read a chunk at a time and
+    closed once the response is sent.
+
+    The ETag is the key the file was rendered or cached under, which identifies
+    its content without reading it. ?download=true sends the file as an
+    attachment, which browsers save rather than display even when the page
+    linking to it is on another origin.
+    """
+    size = f.seek(0, os.SEEK_END)
+    f.seek(0)
+
+    etag = quote_etag(key)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.ELD_ARTIFACT_MAX_AGE}",
+        "Accept-Ranges": "bytes",
+    }
+
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        f.close()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    disposition = (
+        "attachment"
+        if request.query_params.get("download", "").lower() in ("1", "true")
+        else "inline"
+    )
+    headers["Content-Disposition"] = f'{disposition}; filename="{filename}"'
+    byte_range = None
+    range_header = request.headers.get("Range")
+    # an If-Range that no longer matches asks for the whole new content
+    if range_header and request.headers.get("If-Range", etag) == etag:
+        try:
+            byte_range = get_byte_range(range_header, size)
+        except ValueError:
+            f.close()
+            headers["Content-Range"] = f"bytes */{size}"
+            return HttpResponse(
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers=headers,
+            )
+
+    response_status = status.HTTP_200_OK
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        response_status = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingHttpResponse(
+        iter_file_range(f, start, end),
+        content_type=CONTENT_TYPES[extension],
+        status=response_status,
+        headers=headers,
+    )
+
+
+class ELDLogArtifactAPIView(APIView):
+    content_negotiation_class = FirstRendererNegotiation
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.eld_log = ELDLog()
+
+    def get(self, request, pk, log_date, extension):
+        """
+        Return the PDF, PNG or WebP image, SVG overlay or JSON drawing list of the
+        ELD log of one day of a trip.
+
+        Images accept a render profile, ?profile=palette for instance, that
+        renders in the extension's format.
+        """
+        try:
+            try:
+                log_date = date.fromisoformat(log_date)
+            except ValueError:
+                log_date = None
+            if extension not in CONTENT_TYPES or log_date is None:
+                return Response(
+                    {"error": "ELD log not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+
+            profile = request.query_params.get(
+                "profile", DEFAULT_PROFILES.get(extension, DEFAULT_PROFILE)
+            )
+            if extension in DEFAULT_PROFILES and (
+                RENDER_PROFILES.get(profile, {}).get("format") != extension
+            ):
+                profiles = ", ".join(
+                    name
+                    for name, render_profile in RENDER_PROFILES.items()
+                    if render_profile["format"] == extension
+                )
+                return Response(
+                    {"error": f"profile must be one of {profiles} for {extension}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            trip = Trip.objects.filter(pk=pk).first()
+            if not trip:
+                return Response(
+                    {"error": "Trip not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+
+            plan_write_behind.flush_trip(trip.id)
+            daily_log = trip.daily_logs.filter(date=log_date).first()
+            if not daily_log:
+                return Response(
+                    {"error": "ELD log not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+
+            artifact, key = self.eld_log.open_eld_log_artifact(
+                trip, daily_log, extension, profile
+            )
+            return build_artifact_response(
+                request, artifact, extension, f"ELD_Log_{log_date}.{extension}", key
+            )
+        except PlanWriteFailed as e:
+            return build_plan_write_failed_response(e)
+        except Exception as e:
+            general_logger.error(f"Error occured: {e}")
+            return Response(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class TripELDLogPDFAPIView(APIView):
+    content_negotiation_class = FirstRendererNegotiation
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.eld_log = ELDLog()
+
+    def get(self, request, pk):
+        """
+        Return the ELD logs of a whole trip as a single multi-page PDF.
+        """
+        try:
+            trip = Trip.objects.filter(pk=pk).first()
+            if not trip:
+                return Response(
+                    {"error": "Trip not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+
+            plan_write_behind.flush_trip(trip.id)
+            daily_logs = trip.get_daily_logs(with_duty_statuses=True)
+            pdf_file, key = self.eld_log.open_trip_pdf(trip, daily_logs)
+            return build_artifact_response(
+                request, pdf_file, "pdf", f"ELD_Logs_{trip.id}.pdf", key
+            )
+        except PlanWriteFailed as e:
+            return build_plan_write_failed_response(e)
+        except Exception as e:
+            general_logger.error(f"Error occured: {e}")
+            return Response(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class LogSheetAPIView(APIView):
+    content_negotiation_class = FirstRendererNegotiation
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.eld_log = ELDLog()
+
+    def get(self, request):
+        """
+        Return the blank log sheet that the SVG and JSON ELD logs are drawn over.
+        """
+        try:
+            content = self.eld_log.render_log_sheet_png(BACKGROUND_IMAGE)
+            return build_artifact_response(
+                request,
+                BytesIO(content),
+                "png",
+                "log_sheet.png",
+                self.eld_log.get_log_sheet_key(BACKGROUND_IMAGE),
+            )
+        except Exception as e:
+            general_logger.error(f"Error occured: {e}")
+            return Response(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,67 @@
+import uuid
+from datetime import date, timedelta
+
+from api_v1.helpers.hos_audit import HOSAudit
+from api_v1.lib.logger import general_logger
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+# days audited when neither trips nor dates are given
+DEFAULT_AUDIT_DAYS = 7
+
+
+class HOSAuditAPIView(APIView):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.hos_audit = HOSAudit()
+
+    def get(self, request, format=None):
+        """
+        Audit stored duty statuses for hours of service violations.
+
+        Accepts optional start_date and end_date (YYYY-MM-DD) and repeated trip
+        query parameters. Without any of them, the last 7 days are audited.
+        """
+        try:
+            try:
+                start_date, end_date = (
+                    date.fromisoformat(value) if value else None
+                    for value in (
+                        request.query_params.get("start_date"),
+                        request.query_params.get("end_date"),
+                    )
+                )
+            except ValueError:
+                return Response(
+                    {"error": "Dates must be formatted as YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            try:
+                trip_ids = [
+                    uuid.UUID(trip_id)
+                    for trip_id in request.query_params.getlist("trip")
+                ]
+            except ValueError:
+                return Response(
+                    {"error": "trip must be a trip id (UUID)"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            if not (trip_ids or start_date or end_date):
+                start_date = timezone.localdate() - timedelta(days=DEFAULT_AUDIT_DAYS)
+
+            report = self.hos_audit.summarize(
+                self.hos_audit.iter_audits(
+                    trip_ids=trip_ids, start_date=start_date, end_date=end_date
+                )
+            )
+            report["start_date"] = start_date
+            report["end_date"] = end_date
+            return Response(report, status=status.HTTP_200_OK)
+        except Exception as e:
+            general_logger.error(f"Error occured: {e}")
+            return Response(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,42 @@
+from api_v1.helpers.eld_logs import ELDLog
+from api_v1.helpers.planning_jobs import get_job_progress
+from api_v1.lib.logger import general_logger
+from api_v1.models import PlanningJob
+from api_v1.serializers import PlanningJobSerializer
+from api_v1.views.trip import build_trip_detail_response
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class PlanningJobDetailAPIView(APIView):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.eld_log = ELDLog()
+
+    def get(self, request, pk, format=None):
+        """
+        Return the status and progress of a planning job, and the planned trip
+        once the job has succeeded.
+        """
+        try:
+            job = PlanningJob.objects.select_related("trip").filter(pk=pk).first()
+            if not job:
+                return Response(
+                    {"error": "Planning job not found"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+
+            response = PlanningJobSerializer(job).data
+            response["progress"] = get_job_progress(job)
+            if job.status == "succeeded" and job.trip:
+                response["result"] = build_trip_detail_response(
+                    job.trip, self.eld_log, request
+                )
+
+            return Response(response, status=status.HTTP_200_OK)
+        except Exception as e:
+            general_logger.error(f"Error occured: {e}")
+            return Response(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
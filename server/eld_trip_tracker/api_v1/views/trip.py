@@ -1,21 +1,45 @@
+import itertools
 import json
+import types
 
-import polyline
+from api_v1.helpers.batch_planner import BatchPlanner
 from api_v1.helpers.distance import Distance
 from api_v1.helpers.eld_logs import ELDLog
 from api_v1.helpers.fuel_stops import FuelStop
+from api_v1.helpers.plan_cache import PlanCache
 from api_v1.helpers.trip_calculator import TripCalculator
+from api_v1.helpers.trip_detail_cache import trip_detail_cache
+from api_v1.helpers.write_behind import PlanWriteFailed, plan_write_behind
 from api_v1.lib.llm import SUMMARY_RESPONSE_TEMPLATE, get_llm
 from api_v1.lib.logger import general_logger
 from api_v1.lib.mapbox import MapBoxAPI
-from api_v1.models import DailyLog, DutyStatus, Route, Stop, Trip
+from api_v1.models import PlanningJob, Stop, Trip
+from api_v1.models.daily_log import DUTY_HOURS_FIELDS
 from api_v1.serializers import TripSerializer
-from django.contrib.gis.geos import LineString
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
+# fields of a trip detail response
+DETAIL_FIELDS = (
+    "id",
+    "total_distance",
+    "total_duration",
+    "driving_duration",
+    "stops",
+    "eld_logs",
+    "hos",
+)
+# fields of a trip detail response that trips in a list can include
+LIST_DETAIL_FIELDS = ("driving_duration", "stops", "eld_logs", "hos")
+
 
 def build_response(trip):
     """
@@ -26,6 +50,15 @@ def build_response(trip):
     }
 
 
+def format_stop(stop):
+    return {
+        "coordinates": [stop.location.x, stop.location.y],
+        "timestamp": stop.timestamp,
+        "duration": stop.duration,
+        "stop_type": stop.stop_type.replace("_", " "),
+    }
+
+
 def get_stops(trip, stops):
     stops_data = [
         {
@@ -37,18 +70,74 @@ def get_stops(trip, stops):
     ]
 
     for stop in stops:
-        stops_data.append(
-            {
-                "coordinates": [stop.location.x, stop.location.y],
-                "timestamp": stop.timestamp,
-                "duration": stop.duration,
-                "stop_type": stop.stop_type.replace("_", " "),
-            }
-        )
+        stops_data.append(format_stop(stop))
 
     return stops_data
 
 
+def format_event(event, data):
+    """
+    Format a Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, cls=JSONEncoder)}\n\n"
+
+
+def iter_json(data):
+    """
+    Encode a response as JSON a piece at a time. Generator values are encoded as
+    lists, an item at a time, so that their items are never all in memory.
+
+    The status of the response is sent before its generators run. If one of them
+    fails, its list is closed and the response ends with an "error" field, so the
+    body is still valid JSON that a client can tell from a complete one.
+    """
+    yield "{"
+    for i, (key, value) in enumerate(data.items()):
+        yield ("," if i else "") + json.dumps(key) + ":"
+        if isinstance(value, types.GeneratorType):
+            yield "["
+            try:
+                for j, item in enumerate(value):
+                    yield ("," if j else "") + json.dumps(item, cls=JSONEncoder)
+            except Exception as e:
+                general_logger.error(f"Error occured: {e}")
+                yield "]," + json.dumps("error") + ":" + json.dumps(str(e)) + "}"
+                return
+            yield "]"
+        else:
+            yield json.dumps(value, cls=JSONEncoder)
+    yield "}"
+
+
+def start_generator(generator):
+    """
+    Runs a generator up to its first item, so that a failure to produce it is
+    raised before a response starts streaming.
+
+    returns:
+        a generator of all the items of the given one.
+    """
+    items = list(itertools.islice(generator, 1))
+
+    def resume():
+        yield from items
+        yield from generator
+
+    return resume()
+
+
+def build_plan_write_failed_response(error):
+    """
+    Construct the response to a read of a trip whose plan could not be saved.
+    """
+    general_logger.error(f"Error occured: {error}")
+    return Response(
+        {"error": str(error), "retrying": error.retrying},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "5"} if error.retrying else None,
+    )
+
+
 def build_frontend_response(trip, stops, eld_logs):
     """
     Construct a response containing trip data.
@@ -66,6 +155,178 @@ def build_frontend_response(trip, stops, eld_logs):
     }
 
 
+def get_eld_log_links(request, trip, daily_logs):
+    """
+    Construct the ELD logs of a trip with their duty hours and the URLs of their
+    files. The files are only rendered once they are requested.
+    """
+    eld_logs = []
+    for daily_log in daily_logs:
+        urls = {
+            extension: request.build_absolute_uri(
+                reverse(
+                    "api_v1:trip-eld-log",
+                    kwargs={
+                        "pk": trip.id,
+                        "log_date": daily_log.date.isoformat(),
+                        "extension": extension,
+                    },
+                )
+            )
+            for extension in ("pdf", "png", "webp", "svg", "json")
+        }
+        eld_logs.append(
+            {
+                "date": daily_log.date,
+                "total_miles": daily_log.total_miles,
+                **{
+                    field: getattr(daily_log, field)
+                    for field in DUTY_HOURS_FIELDS.values()
+                },
+                "total_hours": daily_log.total_hours,
+                "pdf_url": urls["pdf"],
+                "img_url": f"{urls['png']}?profile=palette",
+                "thumbnail_url": f"{urls['webp']}?profile=thumbnail",
+                "svg_url": urls["svg"],
+                "drawing_url": urls["json"],
+            }
+        )
+    return eld_logs
+
+
+def get_eld_log_drawings(trip, daily_logs, eld_log):
+    """
+    Construct the ELD logs of a trip as drawing lists to draw over the log sheet.
+    """
+    return [
+        {
+            "date": daily_log.date,
+            "total_miles": daily_log.total_miles,
+            "drawing": eld_log.get_log_drawing(eld_log.get_log_data(trip, daily_log)),
+        }
+        for daily_log in daily_logs
+    ]
+
+
+def strip_artifacts(data):
+    """
+    returns trip data without the links to, or contents of, its ELD log files,
+    which mean nothing to a language model and only lengthen its prompt.
+    """
+    if isinstance(data, dict):
+        return {
+            field: strip_artifacts(value)
+            for field, value in data.items()
+            if not field.endswith(("_url", "_base64")) and field != "drawing"
+        }
+    if isinstance(data, list):
+        return [strip_artifacts(value) for value in data]
+    return data
+
+
+def prefetch_trip_details(trips, artifacts="url", fields=DETAIL_FIELDS):
+    """
+    Fetch the stops and daily logs that build_trip_detail_response needs for the
+    given fields, for all the trips at once.
+    """
+    Trip.prefetch_plans(
+        trips,
+        stops="stops" in fields or "driving_duration" in fields,
+        daily_logs="eld_logs" in fields,
+        with_duty_statuses=artifacts != "url",
+    )
+
+
+def build_trip_detail_response(
+    trip, eld_log, request, artifacts="url", pdf="day", fields=DETAIL_FIELDS
+):
+    """
+    Construct the full frontend response for a trip, including its ELD logs.
+
+    By default the ELD logs carry the URLs of their files, which are rendered
+    when first requested. artifacts="vector" returns their drawing lists, and
+    artifacts="base64" renders the files into the response, as a generator of
+    ELD logs to be written out with iter_json. In that case pdf
+    selects the PDFs included: "day" for one PDF per ELD log, "trip" for the URL
+    of a single multi-page PDF of the whole trip, and "none" for the images alone.
+
+    Only the given fields of DETAIL_FIELDS are computed: the stops are not
+    loaded unless stops or driving_duration are asked for, and the daily logs
+    and ELDLog are not touched unless eld_logs is. Those fetched beforehand with
+    prefetch_trip_details are not fetched again.
+
+    A plan of the trip still waiting to be written must be flushed first.
+    """
+    stops = []
+    if "stops" in fields or "driving_duration" in fields:
+        stops = trip.get_stops()
+
+    eld_logs = []
+    # fields that come with the ELD logs
+    log_fields = {}
+    if "eld_logs" in fields:
+        # a fixed number of queries, whatever the length of the trip: the duty
+        # statuses needed to draw the logs are fetched along with them
+        daily_logs = trip.get_daily_logs(with_duty_statuses=artifacts != "url")
+
+        if artifacts == "url":
+            eld_logs = get_eld_log_links(request, trip, daily_logs)
+            log_fields["trip_pdf_url"] = request.build_absolute_uri(
+                reverse("api_v1:trip-eld-logs-pdf", kwargs={"pk": trip.id})
+            )
+        elif artifacts == "vector":
+            eld_logs = get_eld_log_drawings(trip, daily_logs, eld_log)
+        else:
+            # rendered one day at a time as the response is written, see iter_json
+            eld_logs = eld_log.iter_eld_logs(trip, daily_logs, include_pdf=pdf == "day")
+            if pdf == "trip":
+                # too large to encode into the response, it is streamed from disk
+                log_fields["trip_pdf_url"] = request.build_absolute_uri(
+                    reverse("api_v1:trip-eld-logs-pdf", kwargs={"pk": trip.id})
+                )
+
+        if artifacts != "base64":
+            log_fields["log_sheet_url"] = request.build_absolute_uri(
+                reverse("api_v1:eld-log-sheet")
+            )
+
+    response = {
+        field: value
+        for field, value in build_frontend_response(trip, stops, eld_logs).items()
+        if field in fields
+    }
+    response.update(log_fields)
+    return response
+
+
+def get_requested_fields(request, default_fields, available_fields):
+    """
+    Reads the fields a request asks for from ?fields=, which replaces the default
+    fields, and ?include=, which adds to them.
+
+    returns:
+        the requested fields, in the order of available_fields.
+
+    raises:
+        ValueError: if a requested field is not available.
+    """
+
+    def parse(value):
+        return {field.strip() for field in value.split(",") if field.strip()}
+
+    fields = request.query_params.get("fields")
+    fields = set(default_fields) if fields is None else parse(fields)
+    fields |= parse(request.query_params.get("include", ""))
+
+    unknown = fields.difference(available_fields)
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. "
+            f"Available fields are {', '.join(available_fields)}"
+        )
+    return tuple(field for field in available_fields if field in fields)
+
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 5
     page_query_param = "page"
@@ -98,6 +359,7 @@ class TripListCreateAPIView(APIView):
         self.mapbox_api = MapBoxAPI()
         self.eld_log = ELDLog()
         self.trip_calculator = TripCalculator()
+        self.plan_cache = PlanCache()
 
     def post(self, request):
         try:
@@ -105,47 +367,317 @@ class TripListCreateAPIView(APIView):
             if not serializer.is_valid():
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            trip = serializer.save()
+            if request.query_params.get("mode") == "async":
+                return self.enqueue(request)
 
-            route_data = self.trip_calculator.calculate_initial_route(trip)
-            created_route = Route.objects.create(
-                trip=trip,
-                geometry=LineString(polyline.decode(route_data["geometry"], 5)),
-            )
-            trip, route, _, _, _ = self.trip_calculator.calculate_fuel_stops(
-                trip, created_route, route_data
+            if request.query_params.get("mode") == "stream":
+                response = StreamingHttpResponse(
+                    self.iter_plan_events(request, serializer),
+                    content_type="text/event-stream",
+                )
+                response["Cache-Control"] = "no-cache"
+                response["X-Accel-Buffering"] = "no"
+                return response
+
+            plan_key = self.plan_cache.get_plan_key(serializer.validated_data)
+            idempotency_key = request.headers.get("Idempotency-Key")
+            if idempotency_key:
+                existing_trip = Trip.objects.filter(
+                    idempotency_key=idempotency_key
+                ).first()
+                if existing_trip:
+                    return self.replay(request, existing_trip, plan_key)
+
+            try:
+                # the trip, and its idempotency key with it, is only committed
+                # once it is planned: a failed plan leaves no trip for retries to
+                # replay, and a concurrent retry waits on the key until then
+                with transaction.atomic():
+                    trip = serializer.save(
+                        plan_key=plan_key, idempotency_key=idempotency_key
+                    )
+                    if settings.TRIP_WRITE_BEHIND:
+                        response = self.plan_with_write_behind(request, trip)
+                    else:
+                        if not self.plan_cache.materialize(trip):
+                            self.trip_calculator.plan_trip(trip)
+
+                        trip.create_daily_logs()
+            except IntegrityError:
+                existing_trip = (
+                    Trip.objects.filter(idempotency_key=idempotency_key).first()
+                    if idempotency_key
+                    else None
+                )
+                if not existing_trip:
+                    raise
+                # a concurrent retry with the same key created the trip first
+                return self.replay(request, existing_trip, plan_key)
+
+            if not settings.TRIP_WRITE_BEHIND:
+                response = build_trip_detail_response(trip, self.eld_log, request)
+
+            return Response(response, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-            trip = self.trip_calculator.calculate_rest_stops(trip, route)
-            trip = self.trip_calculator.update_durations_from_stops(trip)
 
-            trip.create_daily_logs()
+    def plan_with_write_behind(self, request, trip):
+        """
+        Plan the trip in memory and build the response from the in-memory plan.
+        The route, stops and logs are written afterwards by the write-behind queue.
+        """
+        route = self.plan_cache.materialize(
+            trip, persist=False
+        ) or self.trip_calculator.plan_trip(trip, persist=False)
+        stops = route.get_ordered_stops()
+        daily_logs = trip.build_daily_logs(stops)
 
-            daily_logs = trip.daily_logs.all().order_by("date")
+        plan_write_behind.enqueue(trip, route, daily_logs)
 
-            eld_logs = self.eld_log.generate_eld_logs(trip, daily_logs)
+        return build_frontend_response(
+            trip, stops, get_eld_log_links(request, trip, daily_logs)
+        )
+
+    def iter_plan_events(self, request, serializer):
+        """
+        Plan the trip and yield a Server-Sent Event as each stage completes, so
+        the client can draw the route while stops and logs are still computed.
+        """
+        try:
+            trip = serializer.save(
+                plan_key=self.plan_cache.get_plan_key(serializer.validated_data)
+            )
+            yield format_event("trip", {"id": trip.id})
+
+            route = self.plan_cache.materialize(trip)
+            if route:
+                yield format_event("route", {"coordinates": route.geometry.coords})
+            else:
+                for stage, route in self.trip_calculator.iter_plan_stages(trip):
+                    if stage == "initial_route":
+                        yield format_event(
+                            "route", {"coordinates": route.geometry.coords}
+                        )
+                    elif stage == "fuel_stops":
+                        # the route is re-calculated through the fuel stations
+                        yield format_event(
+                            "route", {"coordinates": route.geometry.coords}
+                        )
+                        for stop in route.stops.filter(stop_type="fuel").order_by(
+                            "timestamp"
+                        ):
+                            yield format_event("fuel_stop", format_stop(stop))
+                    elif stage == "rest_stops":
+                        rest_stops = route.stops.filter(
+                            stop_type__in=["rest_break", "mandatory_rest"]
+                        ).order_by("timestamp")
+                        yield format_event(
+                            "rest_stops", [format_stop(stop) for stop in rest_stops]
+                        )
 
             stops = Stop.objects.filter(route__trip=trip).order_by("timestamp")
-            response = build_frontend_response(trip, stops, eld_logs)
+            summary = build_frontend_response(trip, stops, [])
+            yield format_event("plan", summary)
 
-            return Response(response, status=status.HTTP_201_CREATED)
+            trip.create_daily_logs()
+            daily_logs = trip.daily_logs.all().order_by("date")
+            yield format_event(
+                "daily_logs",
+                [
+                    {"date": daily_log.date, "total_miles": daily_log.total_miles}
+                    for daily_log in daily_logs
+                ],
+            )
+
+            for eld_log in get_eld_log_links(request, trip, daily_logs):
+                yield format_event("eld_log", eld_log)
+
+            yield format_event("complete", {"id": trip.id})
         except Exception as e:
+            general_logger.error(f"Error occured while streaming trip plan: {e}")
+            yield format_event("error", {"error": str(e)})
+
+    def enqueue(self, request):
+        """
+        Queue the trip for planning by the planning workers and return 202 Accepted
+        with the URL of the job status endpoint. A retry with the same
+        Idempotency-Key returns the job queued by the first request.
+        """
+        idempotency_key = request.headers.get("Idempotency-Key")
+        job = None
+        if idempotency_key:
+            job = PlanningJob.objects.filter(idempotency_key=idempotency_key).first()
+        if not job:
+            try:
+                with transaction.atomic():
+                    job = PlanningJob.objects.create(
+                        payload=request.data, idempotency_key=idempotency_key
+                    )
+                general_logger.info(f"Queued planning job: {job.id}")
+            except IntegrityError:
+                # a concurrent retry with the same key queued the job first
+                job = PlanningJob.objects.filter(
+                    idempotency_key=idempotency_key
+                ).first()
+                if not job:
+                    raise
+        if job.payload != request.data:
             return Response(
-                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {"error": "Idempotency-Key was already used for a different trip"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        status_url = request.build_absolute_uri(
+            reverse("api_v1:planning-job-detail", kwargs={"pk": job.id})
+        )
+        return Response(
+            {"job_id": job.id, "status": job.status, "status_url": status_url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": status_url},
+        )
+
+    def replay(self, request, trip, plan_key):
+        """
+        Return the original trip for a retried POST with the same Idempotency-Key.
+        """
+        if trip.plan_key != plan_key:
+            return Response(
+                {"error": "Idempotency-Key was already used for a different trip"},
+                status=status.HTTP_409_CONFLICT,
             )
 
+        general_logger.info(f"Replaying idempotent trip creation: {trip.id}")
+        # the original request may have left the plan to the write-behind queue
+        plan_write_behind.flush_trip(trip.id)
+        response = build_trip_detail_response(trip, self.eld_log, request)
+        return Response(response, status=status.HTTP_201_CREATED)
+
     def get(self, request, pk=None, format=None):
         """
         Retrieve a list of trips, paginated.
+
+        ?fields= selects the fields of each trip, and ?include=stops,eld_logs
+        adds fields of the trip detail response, which are only computed for
+        the trips of the page when asked for.
         """
+        serializer_fields = tuple(TripSerializer.Meta.fields)
+        try:
+            fields = get_requested_fields(
+                request, serializer_fields, serializer_fields + LIST_DETAIL_FIELDS
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         trips = Trip.objects.all()
         paginator = self.pagination_class()
         page = paginator.paginate_queryset(trips, request, view=self)
+        data = self.get_trips_data(request, trips if page is None else page, fields)
         if page is not None:
-            serializer = TripSerializer(page, many=True)
-            return paginator.get_paginated_response(serializer.data)
+            return paginator.get_paginated_response(data)
 
-        serializer = TripSerializer(trips, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(data, status=status.HTTP_200_OK)
+
+    def get_trips_data(self, request, trips, fields):
+        """
+        Serialize trips with only the given fields, computing the fields of the
+        trip detail response for them only when they are among the fields.
+        """
+        trips = list(trips)
+        detail_fields = tuple(field for field in fields if field in LIST_DETAIL_FIELDS)
+        errors = {}
+        if detail_fields:
+            # a fixed number of queries for the page, whatever its trips
+            errors = plan_write_behind.flush_trips([trip.id for trip in trips])
+            prefetch_trip_details(
+                [trip for trip in trips if trip.id not in errors],
+                fields=detail_fields,
+            )
+
+        data = []
+        for trip_data, trip in zip(TripSerializer(trips, many=True).data, trips):
+            trip_data = {
+                field: value for field, value in trip_data.items() if field in fields
+            }
+            if trip.id in errors:
+                # the trip is listed without its plan, which could not be saved
+                general_logger.error(f"Error occured: {errors[trip.id]}")
+                trip_data["error"] = str(errors[trip.id])
+                trip_data["retrying"] = errors[trip.id].retrying
+            elif detail_fields:
+                trip_data.update(
+                    build_trip_detail_response(
+                        trip, self.eld_log, request, fields=detail_fields
+                    )
+                )
+            data.append(trip_data)
+        return data
+
+
+class TripBatchCreateAPIView(APIView):
+    def post(self, request):
+        """
+        Plan many trips at once. Returns a result or errors for every trip.
+
+        Batches of more than TRIP_BATCH_SYNC_MAX_SIZE trips are queued as
+        planning jobs instead, and every trip's result is the URL of its job.
+        """
+        trip_specs = (
+            request.data.get("trips") if isinstance(request.data, dict) else None
+        )
+        if not isinstance(trip_specs, list) or not trip_specs:
+            return Response(
+                {"error": "trips must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(trip_specs) > settings.TRIP_BATCH_MAX_SIZE:
+            return Response(
+                {
+                    "error": "A batch can contain at most "
+                    f"{settings.TRIP_BATCH_MAX_SIZE} trips"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if len(trip_specs) > settings.TRIP_BATCH_SYNC_MAX_SIZE:
+            return self.enqueue(request, trip_specs)
+
+        results = BatchPlanner().plan(trip_specs)
+
+        return Response({"results": results}, status=status.HTTP_207_MULTI_STATUS)
+
+    def enqueue(self, request, trip_specs):
+        """
+        Queue every trip of a large batch as a planning job, rather than planning
+        them all within the request, and return the URL of each job.
+        """
+        results = [None] * len(trip_specs)
+        jobs = []
+        for index, trip_spec in enumerate(trip_specs):
+            serializer = TripSerializer(data=trip_spec)
+            if not serializer.is_valid():
+                results[index] = {
+                    "index": index,
+                    "status": 400,
+                    "errors": serializer.errors,
+                }
+                continue
+            jobs.append((index, PlanningJob(payload=trip_spec)))
+
+        PlanningJob.objects.bulk_create([job for _, job in jobs])
+        for index, job in jobs:
+            results[index] = {
+                "index": index,
+                "status": 202,
+                "job_id": job.id,
+                "status_url": request.build_absolute_uri(
+                    reverse("api_v1:planning-job-detail", kwargs={"pk": job.id})
+                ),
+            }
+
+        general_logger.info(f"Queued batch of {len(jobs)} planning jobs")
+        return Response({"results": results}, status=status.HTTP_207_MULTI_STATUS)
 
 
 class TripDetailAPIView(APIView):
@@ -160,23 +692,103 @@ class TripDetailAPIView(APIView):
     def get(self, request, pk, format=None):
         """
         Return a single Trip by primary key (pk).
+
+        The ELD logs carry the URLs of their files, ?artifacts=vector returns their
+        drawing lists instead, and ?artifacts=base64 the rendered files. With
+        base64, ?pdf=trip links a single multi-page PDF instead of one PDF per
+        day, and ?pdf=none (or false) leaves the PDFs out altogether.
+
+        ?fields=stops,total_duration returns only the given fields and skips
+        computing the others, ?include= adds fields to the ones returned.
+
+        Responses carry an ETag derived from the trip's version, and a request
+        revalidating an unchanged trip gets 304 Not Modified.
         """
         try:
+            # a plan still waiting to be written bumps the trip's version
+            plan_write_behind.flush_trip(pk)
             trip = Trip.objects.filter(pk=pk).first()
             if not trip:
                 return Response(
                     {"error": "Trip not found"}, status=status.HTTP_404_NOT_FOUND
                 )
 
-            daily_logs = trip.daily_logs.all().order_by("date")
+            pdf = request.query_params.get("pdf", "day").lower()
+            # ?pdf=true and ?pdf=false predate the trip PDF
+            pdf = {"true": "day", "false": "none"}.get(pdf, pdf)
+            if pdf not in ("day", "trip", "none"):
+                return Response(
+                    {"error": "pdf must be one of day, trip or none"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
-            eld_logs = self.eld_log.generate_eld_logs(trip, daily_logs)
+            artifacts = request.query_params.get("artifacts", "url").lower()
+            if artifacts not in ("base64", "url", "vector"):
+                return Response(
+                    {"error": "artifacts must be one of base64, url or vector"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
-            stops = Stop.objects.filter(route__trip=trip).order_by("timestamp")
-            response = build_frontend_response(trip, stops, eld_logs)
+            try:
+                fields = get_requested_fields(request, DETAIL_FIELDS, DETAIL_FIELDS)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            # links are absolute, so responses differ by the host they were built for
+            variant = (
+                artifacts,
+                pdf,
+                ",".join(fields),
+                request.build_absolute_uri("/"),
+            )
+            headers = {
+                "ETag": trip_detail_cache.get_etag(trip, variant),
+                "Cache-Control": "private, no-cache",
+            }
+            not_modified = get_conditional_response(request, etag=headers["ETag"])
+            if not_modified is not None:
+                for header, value in headers.items():
+                    not_modified[header] = value
+                return not_modified
+
+            if artifacts == "base64":
+                # too large to keep in the cache, rendered files are cached on disk
+                prefetch_trip_details([trip], artifacts=artifacts, fields=fields)
+                response = build_trip_detail_response(
+                    trip,
+                    self.eld_log,
+                    request,
+                    artifacts=artifacts,
+                    pdf=pdf,
+                    fields=fields,
+                )
+                if "eld_logs" in response:
+                    # the first log is rendered before the 200 goes out, so that a
+                    # render failure is still answered with a 500
+                    response["eld_logs"] = start_generator(response["eld_logs"])
+                return StreamingHttpResponse(
+                    iter_json(response),
+                    content_type="application/json",
+                    headers=headers,
+                )
+
+            response = trip_detail_cache.get(trip, variant)
+            if response is None:
+                prefetch_trip_details([trip], artifacts=artifacts, fields=fields)
+                response = build_trip_detail_response(
+                    trip,
+                    self.eld_log,
+                    request,
+                    artifacts=artifacts,
+                    pdf=pdf,
+                    fields=fields,
+                )
+                trip_detail_cache.set(trip, variant, response)
 
-            return Response(response, status=status.HTTP_200_OK)
+            return Response(response, status=status.HTTP_200_OK, headers=headers)
 
+        except PlanWriteFailed as e:
+            return build_plan_write_failed_response(e)
         except Exception as e:
             general_logger.error(f"Error occured: {e}")
             return Response(
@@ -191,7 +803,7 @@ class TripDetailAPIView(APIView):
             )
         llm = get_llm()
 
-        formatted_data = json.dumps(request.data)
+        formatted_data = json.dumps(strip_artifacts(request.data))
         prompt = SUMMARY_RESPONSE_TEMPLATE.format(
             data=formatted_data,
             start_location=trip.current_location_name,
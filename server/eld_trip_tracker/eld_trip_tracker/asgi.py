@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "eld_trip_tracker.settings.production")
 
 application = get_asgi_application()
+
+# imported once apps are loaded, the server writes plans left pending on startup
+from api_v1.helpers.write_behind import plan_write_behind  # noqa: E402
+
+plan_write_behind.resume()
@@ -162,3 +162,63 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Plan cache
+# Coordinates are snapped to a grid of this many degrees (~110m at 0.001)
+# and cycle hours are bucketed before hashing trip requests.
+PLAN_CACHE_GRID_DEGREES = float(os.getenv("PLAN_CACHE_GRID_DEGREES", "0.001"))
+PLAN_CACHE_CYCLE_BUCKET_HOURS = float(os.getenv("PLAN_CACHE_CYCLE_BUCKET_HOURS", "0.5"))
+PLAN_CACHE_TTL_HOURS = float(os.getenv("PLAN_CACHE_TTL_HOURS", "24"))
+
+# Batch trip planning
+TRIP_BATCH_MAX_SIZE = int(os.getenv("TRIP_BATCH_MAX_SIZE", "300"))
+TRIP_BATCH_MAX_WORKERS = int(os.getenv("TRIP_BATCH_MAX_WORKERS") or os.cpu_count() or 4)
+# Larger batches are queued as planning jobs rather than planned in the request
+TRIP_BATCH_SYNC_MAX_SIZE = int(os.getenv("TRIP_BATCH_SYNC_MAX_SIZE", "25"))
+
+# Asynchronous planning jobs
+PLANNING_JOB_TIMEOUT_MINUTES = float(os.getenv("PLANNING_JOB_TIMEOUT_MINUTES", "30"))
+PLANNING_JOB_MAX_ATTEMPTS = int(os.getenv("PLANNING_JOB_MAX_ATTEMPTS", "3"))
+
+# Write-behind persistence of computed plans
+TRIP_WRITE_BEHIND = os.getenv("TRIP_WRITE_BEHIND", "false").lower() == "true"
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = float(
+    os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", "1")
+)
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "50"))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+
+# On-disk cache of rendered ELD logs, 0 disables it
+ELD_RENDER_CACHE_DIR = os.getenv("ELD_RENDER_CACHE_DIR") or str(
+    BASE_DIR.parent / "render_cache"
+)
+ELD_RENDER_CACHE_MAX_MB = float(os.getenv("ELD_RENDER_CACHE_MAX_MB", "512"))
+
+# Processes rendering the ELD logs of a trip in parallel, below 2 renders in the
+# request thread
+ELD_RENDER_WORKERS = int(os.getenv("ELD_RENDER_WORKERS") or 0)
+
+# Seconds clients may reuse a downloaded ELD log PDF or image before revalidating it
+ELD_ARTIFACT_MAX_AGE = int(os.getenv("ELD_ARTIFACT_MAX_AGE") or 7 * 24 * 60 * 60)
+
+# Django's cache, shared by all server processes so that a write through one
+# invalidates the responses cached by the others. The database cache table is
+# created by migrations; CACHE_REDIS_URL uses Redis instead, with the redis package
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+        }
+        if CACHE_REDIS_URL
+        else {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "django_cache",
+        }
+    )
+}
+
+# Seconds trip detail responses are kept in Django's cache, 0 disables it
+TRIP_DETAIL_CACHE_SECONDS = int(os.getenv("TRIP_DETAIL_CACHE_SECONDS") or 60 * 60)